@@ -1,56 +1,37 @@
-import threading
 import os
+import shutil
+import tempfile
 import time
-import re
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
-import pandas as pd
 import logging
 import csv
 import json
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from driver_pool import DriverPool
+from extract import extract_rows, strip_scripts
+from snapshot import load_snapshot
+from tree_diff import diff_trees
+from stream_diff import stream_diff
+from change_events import ChangeStream, RotatingFileSink
+import metrics
+from render_cache import dedupe
+from visual import visual_ops
+from page_fetch import csv_rows, duplicate_result, fetch_rows, load_elements, new_driver, save_csv
+from pipeline import Pipeline
 
 
-options = webdriver.ChromeOptions()
-options.add_argument("--disable-logging")
-options.add_argument("--headless")
-
-logging.basicConfig(format='%(asctime)s - %(message)s', level=logging.INFO)
-
-def load_elements(driver):
-    print("Scrolling to load elements...")
-    last_height = driver.execute_script("return document.body.scrollHeight")          #Implementin the scroll function to fetch all code
-    adaptive_wait_time = 0.5
-
-    while True:
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(adaptive_wait_time)
-        new_height = driver.execute_script("return document.body.scrollHeight")
-
-        if new_height == last_height:
-            try:
-                WebDriverWait(driver, 3).until(
-                    EC.presence_of_all_elements_located((By.TAG_NAME, "img"))
-                )
-                break
-            except Exception as e:
-                logging.warning(f"Error while waiting for elements: {e}")
-                break
-        else:
-            last_height = new_height
-            adaptive_wait_time = min(adaptive_wait_time + 0.1, 2)
-
-    print("All elements, including images, should now be fully loaded.")
 
 def html(driver, file_index):                                                      #Setting the html source code in a html file
     try:
         print(f"Extracting HTML content for file index {file_index}...")
         load_elements(driver)
-        page_source = driver.page_source
-        cleaned_source = re.sub(r'<(script|style).*?>.*?</\1>', '', page_source, flags=re.DOTALL)
+        with metrics.stage("page_source") as span:
+            page_source = driver.page_source
+            span.add(bytes=len(page_source))
+        with metrics.stage("strip_scripts"):
+            cleaned_source = strip_scripts(page_source)
         soup = BeautifulSoup(cleaned_source, 'html.parser')
         body_content = soup.body
         body_html = str(body_content) if body_content else ""
@@ -66,144 +47,221 @@ def html(driver, file_index):
 def convert_to_csv(file_path, file_index):                                      #convert the html code to relevent csv file with relevent details using web scrapping
     try:
         print(f"Converting HTML to CSV for file index {file_index}...")
-        data_dict = {'Tag': [], 'Title': [], 'Class': [], 'ID': []}
-
         with open(file_path, "r", encoding="utf-8") as f:
             html_doc = f.read()
-            soup = BeautifulSoup(html_doc, 'html.parser')
-            for tag in soup.find_all(True):
-                data_dict['Tag'].append(tag.name)
-                if tag.name == 'img':
-                    data_dict['Title'].append(tag.get('alt', '').strip('"'))
-                else:
-                    data_dict['Title'].append(tag.get_text(strip=True).strip('"') if not tag.find_all(True) else '')
-                data_dict['Class'].append(tag.get('class', None))
-                data_dict['ID'].append(tag.get('id', None))
-        
-        df = pd.DataFrame(data=data_dict)
-        csv_path = f"data/test{file_index}.csv"
-        df.to_csv(csv_path, index=False)
-        print(f"Data saved successfully as {csv_path}.")
-        return csv_path
+        with metrics.stage("extract", bytes=len(html_doc)) as span:
+            data_dict = extract_rows(html_doc, root='body')                       #Single pass; extract_rows_bs4 is the reference implementation
+            span.add(rows=len(data_dict['Tag']))
+        return save_csv(data_dict, file_index)
     except Exception as e:
         logging.error(f"Error in convert_to_csv function: {e}")
 
-def fetch_and_save_to_csv(url, file_index):
+def fetch_and_save_to_csv(url, file_index, pool=None):
+    return fetch_rows(url, file_index, pool=pool)[2]
+
+def fetch_batch(urls, workers=4, max_pages=50, save=True, csv_export=True, archive=False, mode="browser",  #Render any number of URLs
+                store=None, cache=None, visual=None):                           #over a bounded set of warm drivers
+    firsts, owners = dedupe(urls)                                               #Each distinct URL is rendered once
+    workers = max(1, min(workers, len(firsts)))
+    results = [None] * len(urls)
+
+    def timed_fetch(url, file_index):
+        start = time.perf_counter()
+        rows, snapshot_path, csv_path = fetch_rows(url, file_index, pool=pool, save=save, csv_export=csv_export,
+                                                   archive=archive, mode=mode, store=store, cache=cache, visual=visual)
+        return {"url": url, "index": file_index, "rows": rows, "snapshot_path": snapshot_path, "csv_path": csv_path,
+                "regions": visual.take(url) if visual is not None else None,
+                "latency": round(time.perf_counter() - start, 3)}
+
+    if mode == "static":                                                        #Plain GETs only, never start Chrome
+        pool_context = nullcontext()
+    else:
+        print(f"Starting driver pool with {workers} workers...")
+        pool_context = DriverPool(new_driver, size=workers, max_pages=max_pages,
+                                  warm=mode != "auto")                          #Auto mode may not render at all
+    with pool_context as pool:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(timed_fetch, urls[i], i) for i in firsts]
+            for future in futures:
+                result = future.result()
+                results[result['index']] = result
+                logging.info(f"Fetched {result['url']} in {result['latency']}s")
+        stats = pool.stats() if pool is not None else {"pages": len(firsts), "created": 0}
+    for file_index, first in owners.items():
+        results[file_index] = duplicate_result(results[first], file_index)
+
+    if pool is not None:
+        logging.info(f"Pool utilisation: {stats['utilisation']:.1%} over {stats['pages']} pages "
+                     f"(drivers created: {stats['created']}, recycled: {stats['recycled']}, crashed: {stats['crashed']})")
+    stats["deduplicated"] = len(owners)
+    if cache is not None:
+        stats["cache"] = cache.stats()
+    return results, stats
+
+def read_rows(path):                                                            #Accepts either a .snap snapshot or a CSV export
+    if path.endswith(".snap"):
+        with load_snapshot(path) as snapshot:
+            return csv_rows(snapshot.to_table())
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+def compare(file_list, log_file="change.log", json_file="change.json", stream=False, sinks=None):
+    if stream:                                                                  #Exports too large for memory: external sort + merge
+        report_changes(stream_diff(file_list[0], file_list[1]), log_file=log_file, json_file=json_file, sinks=sinks,
+                       detail=False)
+        return
     try:
-        print(f"Opening WebDriver for URL: {url}")
-        with webdriver.Chrome(options=options) as driver:
-            print(f"WebDriver started for URL: {url}")
-            driver.get(url)
-            print(f"Loading page: {url}")
-            html_path = html(driver, file_index)
-            csv_path = convert_to_csv(html_path, file_index)
-        return csv_path
+        if all(path.endswith(".snap") for path in file_list[:2]):
+            with load_snapshot(file_list[0]) as snapshot1, load_snapshot(file_list[1]) as snapshot2:
+                unchanged = snapshot1.root_hash == snapshot2.root_hash
+            if unchanged:                                                       #Identical root hash, nothing to diff
+                compare_rows([], [], log_file=log_file, json_file=json_file, sinks=sinks)
+                return
+        csv1 = read_rows(file_list[0])
+        csv2 = read_rows(file_list[1])
     except Exception as e:
-        logging.error(f"Error in fetch_and_save_to_csv function for URL {url}: {e}")
+        logging.error(f"Error in compare function: {e}")
+        return
+    compare_rows(csv1, csv2, log_file=log_file, json_file=json_file, sinks=sinks)
 
-def compare(file_list, log_file="change.log", json_file="change.json"):
+def compare_rows(csv1, csv2, log_file="change.log", json_file="change.json", sinks=None):
     try:
         print("Comparing files for changes...")
-        added_rows = []
-        deleted_rows = []
-        modified_rows = []
-
-        
-        with open(file_list[0], 'r', encoding='utf-8') as f1, open(file_list[1], 'r', encoding='utf-8') as f2:
-            csv1 = list(csv.DictReader(f1))
-            csv2 = list(csv.DictReader(f2))
-
-        
-        csv1_set = {frozenset(row.items()) for row in csv1}
-        csv2_set = {frozenset(row.items()) for row in csv2}
-
-       
-        added_rows = [dict(row) for row in (csv2_set - csv1_set)]
-        deleted_rows = [dict(row) for row in (csv1_set - csv2_set)]
-
-        csv1_dict = {row["Tag"]: row for row in csv1 if "Tag" in row}
-        csv2_dict = {row["Tag"]: row for row in csv2 if "Tag" in row}
-
-        common_tags = set(csv1_dict.keys()) & set(csv2_dict.keys())
-        for tag in common_tags:
-            row1 = csv1_dict[tag]
-            row2 = csv2_dict[tag]
-
-            changes = {}
-            for field in ["Title", "Class", "ID"]:
-                if row1.get(field) != row2.get(field):
-                    changes[field] = {"Old": row1.get(field, ""), "New": row2.get(field, "")}
-
-            if changes:  
-                modified_rows.append({"Tag": tag, "Changes": changes})
-
-        print("Logging changes to file...")
-        with open(log_file, 'w', encoding='utf-8') as log:
-            log.write("===== CHANGE LOG =====\n\n")
-
-            log.write(f"Added Rows ({len(added_rows)}):\n")
-            for row in added_rows:
-                log.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Added: {row}\n")
-            log.write("\n")
-
-            log.write(f"Deleted Rows ({len(deleted_rows)}):\n")
-            for row in deleted_rows:
-                log.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Deleted: {row}\n")
-            log.write("\n")
-
-            log.write(f"Modified Rows ({len(modified_rows)}):\n")
-            for row in modified_rows:
-                log.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Modified Tag: {row['Tag']}\n")
-                for field, change in row["Changes"].items():
-                    log.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {field}: Old: '{change['Old']}', New: '{change['New']}'\n")
-            log.write("\n")
-
-            if len(added_rows)+len(deleted_rows)+len(modified_rows)==0:
-                log.write(f"No changes detected.\n")
-            log.write("===== SUMMARY =====\n")
-            log.write(f"Total rows added: {len(added_rows)}\n")
-            log.write(f"Total rows deleted: {len(deleted_rows)}\n")
-            log.write(f"Total rows modified: {len(modified_rows)}\n")
-            log.write(f"Total rows modified: {len(added_rows)+len(deleted_rows)+len(modified_rows)}\n")
+        with metrics.stage("diff", rows=len(csv1) + len(csv2)):
+            ops = diff_trees(csv1, csv2)                                        #Nodes keyed by unique ID or structural path
+    except Exception as e:
+        logging.error(f"Error in compare_rows function: {e}")
+        return
+    report_changes(ops, log_file=log_file, json_file=json_file, sinks=sinks)
+
+CHANGES_PATH = "data/changes.ndjson"                                            #Default NDJSON event stream, one line per change
+
+def _log_lines(op, stamp):                                                      #change.log section and lines for one diff op
+    if op["op"] == "insert":
+        return "Added", [f"{stamp} - Added: {dict(op['row'], Path=op.get('path'))}\n"]
+    if op["op"] == "delete":
+        return "Deleted", [f"{stamp} - Deleted: {dict(op['row'], Path=op.get('path'))}\n"]
+    if op["op"] == "update":
+        return "Modified", [f"{stamp} - Modified Tag: {op['tag']} at {op.get('path')}\n"] + [
+            f"{stamp} - {field}: Old: '{change['Old']}', New: '{change['New']}'\n" for field, change in op["changes"].items()]
+    if op["op"] == "move":
+        return "Moved", [f"{stamp} - Moved Tag: {op['tag']} from {op['from']} to {op['to']}\n"]
+    return None, []
+
+def report_changes(ops, log_file="change.log", json_file="change.json", sinks=None, regions=None, detail=True):  #Write diff_trees ops as the change log and JSON summary
+    """Streams ops to the sinks (data/changes.ndjson by default) and writes change.log and change.json.
+
+    change.json keeps the AddedRows/DeletedRows/... details. With detail=False no op is kept
+    in memory: change.log sections are spooled to temporary files and change.json only holds
+    the counts and where the events went, so the sinks are the only place with the rows.
+    """
+    try:
+        regions = regions or []                                                 #Changed screenshot areas from a VisualChannel
+        if sinks is None:
+            sinks = [RotatingFileSink(CHANGES_PATH)]
+        stream = ChangeStream(sinks) if sinks else None                         #NDJSON events go out while the diff is still running
+        keys = {"Added": "AddedRows", "Deleted": "DeletedRows", "Modified": "ModifiedRows", "Moved": "MovedRows"}
+        rows = {section: [] for section in keys} if detail or stream is None else None
+        counts = dict.fromkeys(keys, 0)
+        stamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')                      #One timestamp per run, not per line
+        sections = {section: tempfile.TemporaryFile("w+", encoding="utf-8") for section in keys}
+        try:
+            for op in ops:
+                if stream is not None:
+                    stream.emit(op)
+                section, lines = _log_lines(op, stamp)
+                if section is None:
+                    continue
+                counts[section] += 1
+                sections[section].writelines(lines)
+                if rows is not None:
+                    if section in ("Added", "Deleted"):
+                        rows[section].append(dict(op["row"], Path=op.get("path")))
+                    elif section == "Modified":
+                        rows[section].append({"Tag": op["tag"], "Path": op.get("path"), "Changes": op["changes"]})
+                    else:
+                        rows[section].append({"Tag": op["tag"], "From": op["from"], "To": op["to"]})
+
+            if stream is not None:
+                for op in visual_ops(regions):
+                    stream.emit(op)
+                stream.close()
+
+            print("Logging changes to file...")
+            total = sum(counts.values())
+            with open(log_file, 'w', encoding='utf-8') as log:
+                log.write("===== CHANGE LOG =====\n\n")
+                for section, spool in sections.items():
+                    log.write(f"{section} Rows ({counts[section]}):\n")
+                    spool.seek(0)
+                    shutil.copyfileobj(spool, log)
+                    log.write("\n")
+
+                if regions:
+                    log.write(f"Visual Regions ({len(regions)}):\n")
+                    for region in regions:
+                        log.write(f"{stamp} - Changed area: x={region['x']} y={region['y']} "
+                                  f"{region['width']}x{region['height']} ({region['tiles']} tiles)\n")
+                    log.write("\n")
+
+                if total == 0 and not regions:
+                    log.write(f"No changes detected.\n")
+                log.write("===== SUMMARY =====\n")
+                log.write(f"Total rows added: {counts['Added']}\n")
+                log.write(f"Total rows deleted: {counts['Deleted']}\n")
+                log.write(f"Total rows modified: {counts['Modified']}\n")
+                log.write(f"Total rows moved: {counts['Moved']}\n")
+                log.write(f"Total rows modified: {total}\n")
+        finally:
+            for spool in sections.values():
+                spool.close()
 
         print("Saving changes to JSON file...")
-        changes_summary = {
-            "AddedRows": added_rows,
-            "DeletedRows": deleted_rows,
-            "ModifiedRows": modified_rows,
-            "Summary": {
-                "TotalAdded": len(added_rows),
-                "TotalDeleted": len(deleted_rows),
-                "TotalModified": len(modified_rows),
-                "TotalChanges": len(added_rows)+len(deleted_rows)+len(modified_rows)
-            }
+        changes_summary = {keys[section]: section_rows for section, section_rows in rows.items()} if rows is not None else {
+            "Run": stream.run, "Events": [getattr(sink, "path", type(sink).__name__) for sink in sinks]}
+        changes_summary["VisualRegions"] = regions
+        changes_summary["Summary"] = {
+            "TotalAdded": counts["Added"],
+            "TotalDeleted": counts["Deleted"],
+            "TotalModified": counts["Modified"],
+            "TotalMoved": counts["Moved"],
+            "TotalVisualRegions": len(regions),
+            "TotalChanges": total
         }
         with open(json_file, 'w', encoding='utf-8') as json_out:
-            json.dump(changes_summary, json_out, indent=4)
+            json.dump(changes_summary, json_out, indent=4 if rows is not None else None)
 
-        logging.info(f"Comparison complete. Check {log_file} and {json_file} for details.")
+        details = json_file if rows is not None else ", ".join(changes_summary["Events"])
+        logging.info(f"Comparison complete. Check {log_file} and {details} for details.")
 
     except Exception as e:
-        logging.error(f"Error in compare function: {e}")
+        logging.error(f"Error in report_changes function: {e}")
 
-def main(url1, url2): 
+def compare_history(store, url, old=-2, new=-1, log_file="change.log", json_file="change.json"):  #Diff two stored versions, no re-render
+    try:
+        csv1 = csv_rows(store.load(url, old))
+        csv2 = csv_rows(store.load(url, new))
+    except Exception as e:
+        logging.error(f"Error in compare_history function: {e}")
+        return
+    compare_rows(csv1, csv2, log_file=log_file, json_file=json_file)
+
+def main(url1, url2, save=True): 
     try:
         print("Setting up data directory...")
         if not os.path.exists("data"):
             os.makedirs("data")
 
-        print("Starting threads for URL fetching...")                                   #Space Complexity- O(N)
-        thread1 = threading.Thread(target=fetch_and_save_to_csv, args=(url1, 0))        #Time Complexity-O(N)
-        thread2 = threading.Thread(target=fetch_and_save_to_csv, args=(url2, 1))
-
-        thread1.start()
-        thread2.start()
-
-        thread1.join()
-        thread2.join()
+        print("Starting render and extraction workers...")                           #Space Complexity- O(N)
+        pipeline = Pipeline(render_workers=2, save=save)                                #Time Complexity-O(N)
+        results, diffs, _ = pipeline.run([url1, url2], pairs=[(0, 1)])
 
         print("Completed fetching tags in real time for both URLs.")
-        compare(["data/test0.csv", "data/test1.csv"])
+        if (0, 1) in diffs:
+            report_changes(diffs[(0, 1)], regions=results[1].get("regions"))        #Diffed in a worker process, no CSV re-read
+        if metrics.enabled():
+            prom_path, trace_path = metrics.write_reports()
+            print(f"Stage metrics saved as {prom_path} and {trace_path}.")
     except Exception as e:
         logging.error(f"Error in main function: {e}")
 
@@ -0,0 +1,265 @@
+import argparse
+import html as html_escape
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import Selenium
+import test
+import test2
+import test3
+
+TAGS = ["div", "span", "p", "a", "li", "ul", "section", "article", "img", "h2"]
+CONTAINERS = {"div", "ul", "section", "article", "li"}
+
+
+def generate_nodes(nodes, depth=12, classes=50, seed=0):
+    """Synthetic page as a list of [tag, class, id, text, depth] in document order.
+
+    Depth is a bounded random walk so nesting reaches `depth` without every node being a
+    chain; `classes` sets how many distinct class names the page uses.
+    """
+    rng = random.Random(seed)
+    result = []
+    level = 0
+    for i in range(nodes):
+        if result and result[-1][0] in CONTAINERS and level < depth:
+            level = rng.choice((level, level + 1, level + 1, max(level - 1, 0)))
+        else:
+            level = rng.randint(max(level - 1, 0), level)
+        tag = rng.choice(sorted(CONTAINERS)) if level < depth and rng.random() < 0.5 else rng.choice(TAGS)
+        class_name = f"c{rng.randrange(classes)}" if rng.random() < 0.7 else None
+        id_ = f"n{i}" if rng.random() < 0.1 else None
+        result.append([tag, class_name, id_, f"text {rng.randrange(nodes)}", level])
+    return result
+
+
+def mutate_nodes(page, change_rate=0.01, seed=1):
+    """Copy of a page with about change_rate of its nodes edited, removed or inserted.
+
+    An inserted <p> goes after the whole subtree of the node it was drawn for, so it becomes
+    that node's next sibling instead of swallowing its children.
+    """
+    rng = random.Random(seed)
+    result = []
+    pending = []                                                                #Inserts waiting for their subtree to end, deepest last
+    for i, node in enumerate(page):
+        while pending and pending[-1][4] >= node[4]:
+            result.append(pending.pop())
+        if rng.random() >= change_rate:
+            result.append(list(node))
+            continue
+        kind = rng.randrange(3)
+        if kind == 0:
+            result.append(node[:3] + [f"changed {i}", node[4]])
+        elif kind == 1 and node[0] not in CONTAINERS:
+            continue                                                            #Only leaves, so depths stay consistent
+        else:
+            result.append(list(node))
+            pending.append(["p", None, None, f"inserted {i}", node[4]])
+    result.extend(reversed(pending))
+    return result
+
+
+def render_html(page):
+    parts = ["<html><head><title>bench</title></head><body>"]
+    stack = []
+    for tag, class_name, id_, text, depth in page:
+        while len(stack) > depth:
+            parts.append(f"</{stack.pop()}>")
+        attrs = ""
+        if class_name:
+            attrs += f' class="{class_name}"'
+        if id_:
+            attrs += f' id="{id_}"'
+        if tag == "img":
+            parts.append(f'<img{attrs} alt="{html_escape.escape(text)}">')
+            continue
+        parts.append(f"<{tag}{attrs}>{html_escape.escape(text)}")
+        stack.append(tag)
+    while stack:
+        parts.append(f"</{stack.pop()}>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def generate_site(pages=20, nodes=200, fanout=3, seed=0):
+    """{path: html} for a small linked site: page i links to pages fanout*i+1 .. fanout*i+fanout.
+
+    Every page also carries links the crawler has to normalise or skip: the home page spelt
+    differently, a fragment, a tracking parameter, a relative path, an off-site URL and a
+    mailto. A non-zero seed gives the same links with about 5% of the content changed.
+    """
+    site = {}
+    for i in range(pages):
+        path = "/" if i == 0 else f"/page/{i}"
+        content = generate_nodes(nodes, seed=i)
+        if seed:
+            content = mutate_nodes(content, change_rate=0.05, seed=seed * pages + i)
+        links = [f'<a href="/page/{child}">page {child}</a>'
+                 for child in range(fanout * i + 1, min(fanout * i + fanout, pages - 1) + 1)]
+        links += ['<a href="/#top">home</a>',
+                  f'<a href="{path}?utm_source=nav">self</a>', '<a href="../page/1">first</a>',
+                  '<a href="https://example.org/">elsewhere</a>', '<a href="mailto:team@example.org">mail</a>']
+        site[path] = render_html(content).replace("</body>", f"<nav>{''.join(links)}</nav></body>")
+    return site
+
+
+class PageServer:
+    """Serves {path: html} from a local ThreadingHTTPServer for the Selenium and static paths."""
+
+    def __init__(self, pages, host="127.0.0.1", port=0):
+        encoded = self.pages = {path: body.encode("utf-8") for path, body in pages.items()}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                body = encoded.get(self.path)
+                self.send_response(200 if body is not None else 404)
+                body = body or b"not found"
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def update(self, pages):                                                    #Change the site between runs on the same port
+        self.pages.update({path: body.encode("utf-8") for path, body in pages.items()})
+
+    def url(self, path):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def time_call(fn, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"min": round(min(timings), 4), "median": round(statistics.median(timings), 4), "runs": repeat}
+
+
+def run_benchmarks(sizes, depth=12, classes=50, change_rate=0.01, repeat=3, browser=False):
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)                                                           #Every entry point writes under data/
+    os.makedirs("data")
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    log_handler = logging.FileHandler("change.log")                             #Not the stderr handler importing Selenium set up,
+    log_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))    #so timings exclude terminal output, as test2 intends
+    root.handlers = [log_handler]
+    root.setLevel(logging.INFO)
+    try:
+        for size in sizes:
+            page = generate_nodes(size, depth=depth, classes=classes)
+            documents = [render_html(page), render_html(mutate_nodes(page, change_rate))]
+            for i, document in enumerate(documents):
+                with open(f"data/elements{i}.html", "w", encoding="utf-8") as f:
+                    f.write(document)
+            csv_paths = ["data/test0.csv", "data/test1.csv"]
+
+            timings = {
+                "convert_to_csv": time_call(lambda: [Selenium.convert_to_csv(f"data/elements{i}.html", i)
+                                                     for i in range(2)], repeat),
+                "Selenium.compare": time_call(lambda: Selenium.compare(csv_paths), repeat),
+                "Selenium.compare[stream]": time_call(lambda: Selenium.compare(csv_paths, stream=True), repeat),
+                "test.compare_csv_advanced": time_call(lambda: test.compare_csv_advanced(*csv_paths), repeat),
+                "test2.compare_csv": time_call(lambda: test2.compare_csv(*csv_paths), repeat),
+                "test3.compare": time_call(lambda: test3.compare(csv_paths), repeat),
+            }
+            with PageServer({"/0": documents[0], "/1": documents[1]}) as server:
+                urls = [server.url("/0"), server.url("/1")]
+                timings["end_to_end[static]"] = time_call(
+                    lambda: Selenium.compare_rows(*(Selenium.csv_rows(Selenium.fetch_rows(url, i, mode="static")[0])
+                                                    for i, url in enumerate(urls))), repeat)
+                if browser:
+                    with Selenium.new_driver() as driver:
+                        def render_html_files():
+                            for i, url in enumerate(urls):
+                                driver.get(url)
+                                Selenium.html(driver, i)
+                        timings["html"] = time_call(render_html_files, repeat)
+                    timings["end_to_end[browser]"] = time_call(lambda: Selenium.main(*urls), repeat)
+            results[str(size)] = timings
+            print(f"{size} nodes: " + ", ".join(f"{name} {t['median']}s" for name, t in timings.items()))
+    finally:
+        root.handlers = handlers
+        root.setLevel(level)
+        log_handler.close()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def find_regressions(results, baseline, threshold=0.2):
+    regressions = []
+    for size, timings in results.items():
+        for name, timing in timings.items():
+            previous = baseline.get(size, {}).get(name)
+            if previous and timing["median"] > previous["median"] * (1 + threshold):
+                regressions.append({"size": size, "benchmark": name, "baseline": previous["median"],
+                                    "current": timing["median"]})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time extraction, comparators and end-to-end runs on synthetic pages.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated node counts, up to 1000000")
+    parser.add_argument("--depth", type=int, default=12)
+    parser.add_argument("--classes", type=int, default=50, help="distinct class names per page")
+    parser.add_argument("--change-rate", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--browser", action="store_true", help="also time html() and main() through headless Chrome")
+    parser.add_argument("--output", default="benchmarks")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown over baseline that counts as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks([int(size) for size in args.sizes.split(",")], depth=args.depth, classes=args.classes,
+                             change_rate=args.change_rate, repeat=args.repeat, browser=args.browser)
+    os.makedirs(args.output, exist_ok=True)
+    run = {"timestamp": datetime.now().strftime('%Y-%m-%dT%H:%M:%S'), "python": sys.version.split()[0],
+           "params": vars(args), "results": results}
+    with open(os.path.join(args.output, f"results-{run['timestamp'].replace(':', '')}.json"), "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=4)
+
+    baseline_path = os.path.join(args.output, "baseline.json")
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"Baseline saved to {baseline_path}.")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            regressions = find_regressions(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['benchmark']} at {regression['size']} nodes: "
+                  f"{regression['baseline']}s -> {regression['current']}s")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,141 @@
+import json
+import os
+import socket
+import uuid
+from datetime import datetime
+
+# Every event has all of these keys, null when they do not apply to its op.
+EVENT_FIELDS = ("run", "ts", "seq", "op", "tag", "path", "index", "from", "to", "row", "changes", "region")
+
+
+class FileSink:
+    """Appends NDJSON batches to one file."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "ab")
+
+    def write(self, events, payload):
+        self._file.write(payload)
+        self._file.flush()                                                      #Readers tailing the file see whole batches
+
+    def close(self):
+        self._file.close()
+
+
+class RotatingFileSink(FileSink):
+    """NDJSON file that rolls over to path.1 ... path.N once it would exceed max_bytes."""
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, backups=5):
+        super().__init__(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "ab")
+
+    def write(self, events, payload):
+        if self._file.tell() and self._file.tell() + len(payload) > self.max_bytes:
+            self._rotate()
+        super().write(events, payload)
+
+
+class QueueSink:
+    """Hands events to an in-process consumer through a queue.Queue or asyncio-style put()."""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def write(self, events, payload):
+        for event in events:
+            self.queue.put(event)
+
+    def close(self):
+        self.queue.put(None)                                                    #End of stream
+
+
+class SocketSink:
+    """Sends NDJSON batches to a local socket: a (host, port) pair or a Unix socket path."""
+
+    def __init__(self, address, timeout=10):
+        if isinstance(address, str):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(address)
+
+    def write(self, events, payload):
+        self._socket.sendall(payload)
+
+    def close(self):
+        self._socket.close()
+
+
+class ChangeStream:
+    """Turns diff ops into NDJSON change events and writes them to sinks in batches.
+
+    One run id and one timestamp are taken when the stream opens and stamped on every
+    event, so a run's events can be grouped downstream without per-line clock calls.
+    Each batch is serialised once and shared by all sinks.
+    """
+
+    def __init__(self, sinks, batch_size=500, run=None):
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.run = run or uuid.uuid4().hex[:12]
+        self.ts = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+        self.counts = {}
+        self._seq = 0
+        self._batch = []
+
+    def event(self, op):
+        event = dict.fromkeys(EVENT_FIELDS)
+        event.update(run=self.run, ts=self.ts, seq=self._seq, op=op["op"], tag=op.get("tag"), path=op.get("path"),
+                     index=op.get("index"), changes=op.get("changes"), row=op.get("row"),
+                     region=op.get("region"))
+        event["from"], event["to"] = op.get("from"), op.get("to")
+        self._seq += 1
+        return event
+
+    def emit(self, op):
+        self._batch.append(self.event(op))
+        self.counts[op["op"]] = self.counts.get(op["op"], 0) + 1
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._batch:
+            return
+        payload = "".join(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n"
+                          for event in self._batch).encode("utf-8")
+        for sink in self.sinks:
+            sink.write(self._batch, payload)
+        self._batch = []
+
+    def close(self):
+        self.flush()
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def stream_changes(ops, sinks, batch_size=500):                                  #Drain any iterable of diff ops into sinks
+    with ChangeStream(sinks, batch_size=batch_size) as stream:
+        for op in ops:
+            stream.emit(op)
+    return stream.counts
@@ -1,15 +1,9 @@
-file_list = ['data/test0.csv', 'data/test1.csv']
-
-with open(file_list[0], 'r', encoding='utf-8') as f:
-    f1 = f.readlines()
+from stream_diff import stream_diff
 
-with open(file_list[1], 'r', encoding='utf-8') as f:
-    f2 = f.readlines()
-
-for row1 in f1:
-    if row1 not in f2:
-        print("Tag removed:", row1.strip()) 
+file_list = ['data/test0.csv', 'data/test1.csv']
 
-for row2 in f2:
-    if row2 not in f1:
-        print("Tag added:", row2.strip())  
+for event in stream_diff(file_list[0], file_list[1]):                          #Sorted-merge diff, constant memory
+    if event["op"] in ("delete", "update"):
+        print("Tag removed:", ",".join((event["row"] if event["op"] == "delete" else event["old"]).values()))
+    if event["op"] in ("insert", "update"):
+        print("Tag added:", ",".join((event["row"] if event["op"] == "insert" else event["new"]).values()))
@@ -0,0 +1,263 @@
+import argparse
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+import numpy as np
+import metrics
+from page_fetch import MODES, fetch_rows, new_driver
+from driver_pool import DriverPool
+from monitor import diff_rows, log_change
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid"}
+SKIP_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".ico", ".pdf", ".zip", ".gz", ".mp4", ".mp3",
+                   ".css", ".js", ".woff", ".woff2", ".xml", ".json")
+
+
+def normalise_url(url, base=None):
+    """Canonical form used for the seen-set, or None for links the crawler never follows.
+
+    Resolves against base, lower-cases scheme and host, drops the default port, the
+    fragment and tracking parameters (utm_*, gclid, ...), and sorts the query, so the
+    same page reached through different spellings is fetched once.
+    """
+    try:
+        parts = urlsplit(urljoin(base, url.strip()) if base else url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None                                                             #mailto:, javascript:, tel:, data: ...
+    path = urljoin("/", parts.path or "/")                                      #Also resolves ./ and ../ in absolute URLs
+    if path.lower().endswith(SKIP_EXTENSIONS):
+        return None
+    host = parts.hostname.rstrip(".")
+    netloc = host if port in (None, DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not key.startswith("utm_") and key not in TRACKING_PARAMS)
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+class BloomFilter:
+    """Fixed-size seen-set: about 1.8 bytes per URL at a 0.1% false-positive rate.
+
+    A false positive only means a page is skipped, never that one is fetched twice. Bit
+    positions come from one BLAKE2b digest split into two 64-bit halves (double hashing).
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=0.001):
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):                                                        #True when the item was not there yet
+        positions = self._positions(item)
+        new = False
+        for position in positions:
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                new = True
+        self.count += new
+        return new
+
+    def __contains__(self, item):
+        return all(self.bits[position // 8] & (1 << position % 8) for position in self._positions(item))
+
+    def __len__(self):
+        return self.count
+
+
+class Frontier:
+    """Queue of (url, depth) that only ever admits a normalised URL once.
+
+    One FIFO per host, taken round-robin, so a host at its concurrency limit never holds up
+    the others and each host is still crawled breadth-first.
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=0.001):
+        self.seen = BloomFilter(capacity, error_rate)
+        self._hosts = OrderedDict()                                             #host -> deque of (url, depth)
+        self._size = 0
+
+    def push(self, url, depth):
+        if not self.seen.add(url):
+            return False
+        self._hosts.setdefault(urlsplit(url).hostname, deque()).append((url, depth))
+        self._size += 1
+        return True
+
+    def pop_ready(self, busy):                                                  #None when empty or every queued host is busy
+        for host, queue in self._hosts.items():
+            if host not in busy:
+                entry = queue.popleft()
+                del self._hosts[host]
+                if queue:
+                    self._hosts[host] = queue                                   #Back of the round-robin
+                self._size -= 1
+                return entry
+        return None
+
+    def __len__(self):
+        return self._size
+
+
+class Crawler:
+    """Same-site crawl that feeds every page it finds through fetch -> extract -> diff.
+
+    Starts from the seeds, takes links from the page as it is extracted (no second parse),
+    and keeps going breadth-first until max_depth or max_pages. Only the seeds' hosts are
+    followed (plus their subdomains with allow_subdomains), at most host_concurrency pages
+    per host at a time, over `workers` fetch threads. With a SnapshotStore, each page is
+    diffed against its previous version and changes go to on_change(url, ops).
+    """
+
+    def __init__(self, seeds, fetch, max_depth=2, max_pages=100, workers=4, host_concurrency=2, hosts=None,
+                 allow_subdomains=False, store=None, on_change=None, capacity=1_000_000):
+        self.seeds = [url for url in (normalise_url(seed) for seed in seeds) if url]
+        self.fetch = fetch
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.workers = workers
+        self.host_concurrency = host_concurrency
+        self.hosts = set(hosts) if hosts else {urlsplit(url).hostname for url in self.seeds}
+        self.allow_subdomains = allow_subdomains
+        self.store = store
+        self.on_change = on_change or log_change
+        self.frontier = Frontier(capacity)
+        self.stats = {"pages": 0, "failed": 0, "links": 0, "queued": 0, "off_site": 0, "too_deep": 0, "changed": 0}
+        self._active = {}
+
+    def allowed(self, url):
+        host = urlsplit(url).hostname
+        return host in self.hosts or (self.allow_subdomains and any(host.endswith("." + root) for root in self.hosts))
+
+    def _visit(self, url, depth, file_index):
+        links = []
+        previous = None
+        with metrics.bind_url(url):
+            if self.store is not None and self.store.versions(url):
+                previous = self.store.load(url)
+            rows = self.fetch(url, file_index, links)
+            ops = diff_rows(previous, rows) if previous is not None and rows is not None else []
+        return {"url": url, "depth": depth, "index": file_index, "rows": rows, "links": links, "ops": ops}
+
+    def _enqueue(self, page):
+        if page["depth"] >= self.max_depth:
+            self.stats["too_deep"] += len(page["links"])
+            return
+        for link in page["links"]:
+            url = normalise_url(link, page["url"])
+            if url is None:
+                continue
+            self.stats["links"] += 1
+            if not self.allowed(url):
+                self.stats["off_site"] += 1
+            elif self.frontier.push(url, page["depth"] + 1):
+                self.stats["queued"] += 1
+
+    def run(self):
+        """Returns one {url, depth, index, rows, ops} dict per page fetched, in fetch order."""
+        for seed in self.seeds:
+            self.frontier.push(seed, 0)
+        pages = []
+        submitted = 0
+        running = {}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while running or (len(self.frontier) and submitted < self.max_pages):
+                while len(running) < self.workers and submitted < self.max_pages:
+                    busy = {host for host, count in self._active.items() if count >= self.host_concurrency}
+                    entry = self.frontier.pop_ready(busy)
+                    if entry is None:
+                        break                                                   #Empty, or every queued host is at its limit
+                    url, depth = entry
+                    host = urlsplit(url).hostname
+                    self._active[host] = self._active.get(host, 0) + 1
+                    running[executor.submit(self._visit, url, depth, submitted)] = host
+                    submitted += 1
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    host = running.pop(future)
+                    self._active[host] -= 1
+                    try:
+                        page = future.result()
+                    except Exception as e:
+                        self.stats["failed"] += 1
+                        logging.error(f"Error while crawling a page on {host}: {e}")
+                        continue
+                    if page["rows"] is None:
+                        self.stats["failed"] += 1
+                        continue
+                    self.stats["pages"] += 1
+                    if page["ops"]:
+                        self.stats["changed"] += 1
+                        self.on_change(page["url"], page["ops"])
+                    self._enqueue(page)
+                    del page["links"]
+                    pages.append(page)
+        self.stats["seen"] = len(self.frontier.seen)
+        self.stats["elapsed"] = round(time.perf_counter() - started, 3)
+        logging.info(f"Crawled {self.stats['pages']} pages in {self.stats['elapsed']}s "
+                     f"({self.stats['queued']} URLs queued, {self.stats['off_site']} off-site links skipped, "
+                     f"{self.stats['failed']} failed)")
+        return pages
+
+
+def crawl_site(seeds, max_depth=2, max_pages=100, workers=4, host_concurrency=2, mode="browser", store=None,
+               save=False, csv_export=False, **kwargs):
+    """Crawls with fetch_rows; browser modes share one DriverPool of `workers` drivers."""
+    def crawl(pool):
+        fetch = lambda url, file_index, links: fetch_rows(url, file_index, pool=pool, save=save, csv_export=csv_export,
+                                                          mode=mode, store=store, links=links)[0]
+        crawler = Crawler(seeds, fetch, max_depth=max_depth, max_pages=max_pages, workers=workers,
+                          host_concurrency=host_concurrency, store=store, **kwargs)
+        return crawler.run(), crawler.stats
+
+    if mode == "static":
+        return crawl(None)
+    with DriverPool(new_driver, size=workers) as pool:
+        return crawl(pool)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl a site from seed URLs and diff every page against history.")
+    parser.add_argument("seeds", nargs="*")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--host-concurrency", type=int, default=2)
+    parser.add_argument("--mode", default="browser", choices=MODES)
+    parser.add_argument("--subdomains", action="store_true", help="also follow subdomains of the seed hosts")
+    parser.add_argument("--history", default="history")
+    parser.add_argument("--demo", type=int, default=0, metavar="N", help="crawl a local N-page stand-in site twice")
+    args = parser.parse_args()
+
+    from history import SnapshotStore
+    store = SnapshotStore(args.history)
+    options = dict(max_depth=args.depth, max_pages=args.pages, workers=args.workers,
+                   host_concurrency=args.host_concurrency, mode=args.mode, store=store,
+                   allow_subdomains=args.subdomains)
+    if args.demo:
+        from benchmark import PageServer, generate_site
+        site = generate_site(args.demo)
+        with PageServer(site) as server:
+            print(crawl_site([server.url("/")], **options)[1])
+            server.update(generate_site(args.demo, seed=1))                    #Same links, changed content
+            print(crawl_site([server.url("/")], **options)[1])
+    else:
+        print(crawl_site(args.seeds, **options)[1])
+    store.close()
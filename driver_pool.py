@@ -0,0 +1,147 @@
+import threading
+import queue
+import time
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _Slot:
+    __slots__ = ("driver", "pages", "created_at")
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.created_at = time.time()
+
+
+class DriverPool:
+    """Keeps a fixed number of warm WebDriver instances and hands them out to worker threads."""
+
+    def __init__(self, factory, size=2, max_pages=50, warm=True):
+        self.factory = factory
+        self.size = size
+        self.max_pages = max_pages
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._opened_at = time.time()
+        self._busy_time = 0.0
+        self._in_use = 0
+        self.created = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.pages = 0
+
+        if warm and size:
+            # Chrome startup dominates, so warm all instances in parallel.
+            with ThreadPoolExecutor(max_workers=size) as executor:
+                for slot in executor.map(lambda _: self._new_slot(), range(size)):
+                    self._idle.put(slot)
+        else:
+            for _ in range(size):
+                self._idle.put(None)
+
+    def _new_slot(self):
+        driver = self.factory()
+        with self._lock:
+            self.created += 1
+        return _Slot(driver)
+
+    def _quit(self, slot):
+        try:
+            slot.driver.quit()
+        except Exception as e:
+            logging.warning(f"Error while quitting driver: {e}")
+
+    def _healthy(self, slot):
+        try:
+            slot.driver.execute_script("return 1")
+            return True
+        except Exception as e:
+            logging.warning(f"Driver failed health check, replacing it: {e}")
+            return False
+
+    def acquire(self, timeout=None):
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+        slot = self._idle.get(timeout=timeout)
+        try:
+            if slot is None:
+                slot = self._new_slot()
+            elif not self._healthy(slot):
+                self._quit(slot)
+                with self._lock:
+                    self.crashed += 1
+                slot = self._new_slot()
+        except Exception:
+            self._idle.put(None)
+            raise
+        with self._lock:
+            self._in_use += 1
+        return slot
+
+    def release(self, slot, busy_time=0.0, failed=False):
+        slot.pages += 1
+        with self._lock:
+            self._in_use -= 1
+            self._busy_time += busy_time
+            self.pages += 1
+
+        if self._closed:
+            self._quit(slot)
+            return
+        if failed or slot.pages >= self.max_pages:
+            self._quit(slot)
+            with self._lock:
+                if failed:
+                    self.crashed += 1
+                else:
+                    self.recycled += 1
+            # The replacement is started lazily by the next acquire.
+            slot = None
+        self._idle.put(slot)
+
+    @contextmanager
+    def driver(self, timeout=None):
+        slot = self.acquire(timeout=timeout)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield slot.driver
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.release(slot, time.perf_counter() - start, failed=failed)
+
+    def stats(self):
+        with self._lock:
+            elapsed = time.time() - self._opened_at
+            capacity = self.size * elapsed
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "pages": self.pages,
+                "created": self.created,
+                "recycled": self.recycled,
+                "crashed": self.crashed,
+                "busy_time": round(self._busy_time, 3),
+                "utilisation": round(self._busy_time / capacity, 3) if capacity else 0.0,
+            }
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                slot = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if slot is not None:
+                self._quit(slot)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,264 @@
+import json
+import re
+from html import unescape
+from html.entities import html5
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup
+from merkle import add_hashes
+from node_table import TableBuilder
+
+SCRIPT_STYLE_RE = re.compile(r'<(script|style).*?>.*?</\1>', flags=re.DOTALL)
+
+# Tags that html.parser/BeautifulSoup close as soon as they are opened.
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem',
+    'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame',
+    'image', 'isindex', 'nextid', 'spacer',
+}
+LINK_TAGS = {'a', 'area'}
+
+
+class _Frame:
+    __slots__ = ("name", "row", "leaf", "text")
+
+    def __init__(self, name, row):
+        self.name = name
+        self.row = row
+        self.leaf = True
+        self.text = []
+
+
+class RowExtractor(HTMLParser):
+    """Builds the Tag/Title/Class/ID rows in a single pass over the markup.
+
+    Rows are appended to a TableBuilder in document order when a tag opens and their Title
+    is filled in when it closes, by which point we know whether any child tag was seen. With
+    a `root` tag name, only the first such element's subtree is recorded, at depths relative
+    to it. With a `links` list, the raw href of every <a> and <area> is appended to it on
+    the same pass.
+    """
+
+    def __init__(self, root=None, links=None):
+        super().__init__(convert_charrefs=False)
+        self.builder = TableBuilder()
+        self.root = root
+        self.links = links
+        self._recording = root is None
+        self._root_frame = None
+        self._root_depth = 0
+        self._stack = []
+        self._pending = []
+        self._closed_void = {}
+
+    def _flush_text(self):
+        if self._pending:
+            chunk = "".join(self._pending).strip()
+            self._pending = []
+            if chunk and self._stack and self._stack[-1].leaf:
+                self._stack[-1].text.append(chunk)
+
+    def _open(self, name, attrs):
+        self._flush_text()
+        attr_dict = {}
+        for key, value in attrs:
+            attr_dict[key] = '' if value is None else value
+
+        if self.links is not None and name in LINK_TAGS and attr_dict.get('href'):
+            self.links.append(attr_dict['href'])
+        if name == self.root and self._root_frame is None:
+            self._recording = True
+            self._root_depth = len(self._stack)
+        row = None
+        if self._recording:
+            row = self.builder.append(name, attr_dict.get('alt', '').strip('"') if name == 'img' else '',
+                                      attr_dict['class'].split() if 'class' in attr_dict else None,
+                                      attr_dict.get('id', None), len(self._stack) - self._root_depth)
+        if self._stack:
+            parent = self._stack[-1]
+            parent.leaf = False
+            parent.text = []
+        frame = _Frame(name, row)
+        if name == self.root and self._root_frame is None:
+            self._root_frame = frame
+        self._stack.append(frame)
+
+    def _close(self, frame):
+        if frame.row is not None and frame.leaf and frame.name != 'img' and frame.text:
+            self.builder.set_title(frame.row, "".join(frame.text).strip('"'))
+        if frame is self._root_frame:
+            self._recording = False                                             #Only the first root element counts
+
+    def _pop_to(self, name):
+        self._flush_text()
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth].name == name:
+                while len(self._stack) > depth:
+                    self._close(self._stack.pop())
+                return
+
+    def handle_starttag(self, tag, attrs):
+        self._open(tag, attrs)
+        if tag in VOID_TAGS:
+            self._pop_to(tag)
+            self._closed_void[tag] = self._closed_void.get(tag, 0) + 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._open(tag, attrs)
+        self._pop_to(tag)
+
+    def handle_endtag(self, tag):
+        if self._closed_void.get(tag):
+            self._closed_void[tag] -= 1
+        else:
+            self._pop_to(tag)
+
+    def handle_data(self, data):
+        self._pending.append(data)
+
+    def handle_charref(self, name):
+        self._pending.append(unescape(f"&#{name};"))
+
+    def handle_entityref(self, name):                                           #Exact names only, like BeautifulSoup: &notanentity; is not &not;
+        self._pending.append(html5.get(f"{name};", f"&{name}"))
+
+    def unknown_decl(self, data):
+        self._flush_text()
+        if data.upper().startswith("CDATA["):
+            self._pending.append(data[len("CDATA["):])
+        self._flush_text()
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_decl(self, decl):
+        self._flush_text()
+
+    def handle_pi(self, data):
+        self._flush_text()
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        while self._stack:
+            self._close(self._stack.pop())
+
+
+def strip_scripts(html_doc):
+    return SCRIPT_STYLE_RE.sub('', html_doc)
+
+
+def extract_rows(html_doc, root=None, links=None):                              #Linear single pass, leaf detection on the way up
+    parser = RowExtractor(root=root, links=links)
+    parser.feed(html_doc)
+    parser.close()
+    return parser.builder.build()                                               #Empty, like a missing soup.body, when root never opened
+
+
+# Walks the live DOM under document.body inside the browser and returns the rows as one
+# columnar JSON string. Tag names are dictionary-encoded; script and style subtrees are
+# skipped the same way the regex cleanup drops them from page_source.
+# An optional scope {include: [...], exclude: [...]} of CSS selectors or XPaths (anything
+# starting with "/", "./" or "(") narrows the walk to the included subtrees, each rooted
+# at depth 0, minus the excluded ones, before anything is serialised.
+# When arguments[1] is true the payload also carries the resolved href of every link in
+# the document, scoped or not, for the crawler.
+DOM_EXTRACT_SCRIPT = """
+var SKIP = {script: true, style: true};
+var scope = arguments[0] || {}, wantLinks = arguments[1];
+function select(selector) {
+    if (/^(\\.?\\/|\\()/.test(selector)) {
+        var found = document.evaluate(selector, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        var nodes = [];
+        for (var i = 0; i < found.snapshotLength; i++) {
+            if (found.snapshotItem(i).nodeType === 1) { nodes.push(found.snapshotItem(i)); }
+        }
+        return nodes;
+    }
+    return Array.prototype.slice.call(document.querySelectorAll(selector));
+}
+var excluded = new Set();
+(scope.exclude || []).forEach(function (selector) {
+    select(selector).forEach(function (el) { excluded.add(el); });
+});
+var roots = [];
+if (scope.include && scope.include.length) {
+    var picked = new Set();
+    scope.include.forEach(function (selector) {
+        select(selector).forEach(function (el) { picked.add(el); });
+    });
+    picked.forEach(function (el) {
+        for (var up = el.parentElement; up; up = up.parentElement) {
+            if (picked.has(up) || excluded.has(up)) { return; }             // Nested in another root or excluded
+        }
+        if (!excluded.has(el)) { roots.push(el); }
+    });
+    roots.sort(function (a, b) { return a.compareDocumentPosition(b) & Node.DOCUMENT_POSITION_FOLLOWING ? -1 : 1; });
+} else if (document.body) {
+    roots = [document.body];
+}
+var tagIndex = {}, tagNames = [], tags = [], titles = [], classes = [], ids = [], depths = [];
+function clean(text) { return text.replace(/^"+|"+$/g, ''); }
+function visit(el, depth) {
+    var name = el.localName;
+    if (!(name in tagIndex)) { tagIndex[name] = tagNames.length; tagNames.push(name); }
+    tags.push(tagIndex[name]);
+    var row = titles.length, leaf = true, text = '';
+    titles.push('');
+    var cls = el.getAttribute('class');
+    classes.push(cls === null ? null : cls.split(/\\s+/).filter(Boolean));
+    ids.push(el.getAttribute('id'));
+    depths.push(depth);
+    for (var child = el.firstChild; child; child = child.nextSibling) {
+        if (child.nodeType === 1) {
+            if (!SKIP[child.localName] && !excluded.has(child)) { leaf = false; }
+        } else if (leaf && (child.nodeType === 3 || child.nodeType === 4)) {
+            text += child.data.trim();
+        }
+    }
+    if (name === 'img') { titles[row] = clean(el.getAttribute('alt') || ''); }
+    else if (leaf) { titles[row] = clean(text); }
+}
+var stack = [];
+for (var r = roots.length - 1; r >= 0; r--) { stack.push([roots[r], 0]); }
+while (stack.length) {
+    var top = stack.pop(), el = top[0];
+    visit(el, top[1]);
+    for (var child = el.lastElementChild; child; child = child.previousElementSibling) {
+        if (!SKIP[child.localName] && !excluded.has(child)) { stack.push([child, top[1] + 1]); }
+    }
+}
+var links = wantLinks ? Array.prototype.map.call(document.links, function (a) { return a.href; }) : undefined;
+return JSON.stringify({tagNames: tagNames, tags: tags, titles: titles, classes: classes, ids: ids, depths: depths,
+                       links: links});
+"""
+
+
+def extract_rows_from_driver(driver, scope=None, links=None):                   #Extract inside Chrome, only the rows cross the wire
+    return rows_from_payload(driver.execute_script(DOM_EXTRACT_SCRIPT, scope, links is not None), links)
+
+
+def rows_from_payload(payload, links=None):                                     #Decode the DOM_EXTRACT_SCRIPT result and hash it
+    payload = json.loads(payload)
+    if links is not None:
+        links.extend(payload.get('links') or ())
+    tag_names = payload['tagNames']
+    builder = TableBuilder()
+    for tag, title, classes, id_, depth in zip(payload['tags'], payload['titles'], payload['classes'], payload['ids'],
+                                               payload['depths']):
+        builder.append(tag_names[tag], title, classes, id_, depth)
+    return builder.build()
+
+
+def extract_rows_bs4(html_doc):                                                 #Original quadratic extractor, kept as the reference output
+    data_dict = {'Tag': [], 'Title': [], 'Class': [], 'ID': [], 'Depth': []}
+    soup = BeautifulSoup(html_doc, 'html.parser')
+    for tag in soup.find_all(True):
+        data_dict['Tag'].append(tag.name)
+        if tag.name == 'img':
+            data_dict['Title'].append(tag.get('alt', '').strip('"'))
+        else:
+            data_dict['Title'].append(tag.get_text(strip=True).strip('"') if not tag.find_all(True) else '')
+        data_dict['Class'].append(tag.get('class', None))
+        data_dict['ID'].append(tag.get('id', None))
+        data_dict['Depth'].append(len(list(tag.parents)) - 1)
+    return add_hashes(data_dict)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from stream_diff import IGNORED_COLUMNS
+
+KEY_COLUMNS = ["Tag", "ID"]
+
+
+def _row_hashes(df, columns):
+    # categorize=False: factorizing near-unique columns such as ID costs more than hashing them.
+    return pd.util.hash_pandas_object(df[columns], index=False, categorize=False).to_numpy()
+
+
+def _occurrences(sorted_hashes):                                                #0, 1, 2, ... within each run of equal hashes
+    positions = np.arange(len(sorted_hashes))
+    starts = np.r_[True, sorted_hashes[1:] != sorted_hashes[:-1]] if len(sorted_hashes) else np.zeros(0, dtype=bool)
+    return positions - np.maximum.accumulate(np.where(starts, positions, 0))
+
+
+def _pair(hashes1, hashes2):
+    """Pairs equal hashes by occurrence (first with first, second with second, ...).
+
+    Returns the matched positions in each frame; rows left over are unmatched.
+    """
+    order1 = np.argsort(hashes1, kind="stable")
+    order2 = np.argsort(hashes2, kind="stable")
+    sorted1, sorted2 = hashes1[order1], hashes2[order2]
+    nth = _occurrences(sorted1)
+    low = np.searchsorted(sorted2, sorted1, side="left")
+    high = np.searchsorted(sorted2, sorted1, side="right")
+    found = nth < high - low
+    return order1[found], order2[low[found] + nth[found]]
+
+
+def _unmatched(n, matched):
+    mask = np.ones(n, dtype=bool)
+    mask[matched] = False
+    return np.flatnonzero(mask)
+
+
+def diff_frames(df1, df2, key=None):
+    """Added, removed and modified rows between two extracted pages.
+
+    Rows are hashed with hash_pandas_object and joined instead of compared by position, so a
+    row that only shifted is not reported. Identical rows are paired off first; what is left
+    is paired on the key columns (Tag and ID by default, nth with nth), and those pairs are
+    the modified rows. Returns (added, removed, modified), where modified has the same
+    (column, self/other) layout as DataFrame.compare, indexed by the row in df2. Columns
+    are compared as text, and the subtree Hash column is ignored as in stream_diff.
+    """
+    columns = [column for column in list(df1.columns) + [column for column in df2.columns if column not in df1.columns]
+               if column not in IGNORED_COLUMNS]
+    df1 = df1.reindex(columns=columns).astype("string").fillna("")              #read_csv types an all-empty column as float64,
+    df2 = df2.reindex(columns=columns).astype("string").fillna("")              #and equal values must hash the same in both
+    key = [column for column in (key or KEY_COLUMNS) if column in columns] or columns[:1]
+
+    same1, same2 = _pair(_row_hashes(df1, columns), _row_hashes(df2, columns))
+    rest1 = _unmatched(len(df1), same1)
+    rest2 = _unmatched(len(df2), same2)
+
+    left, right = df1.iloc[rest1], df2.iloc[rest2]
+    pos1, pos2 = _pair(_row_hashes(left, key), _row_hashes(right, key))
+    removed = left.iloc[_unmatched(len(left), pos1)]
+    added = right.iloc[_unmatched(len(right), pos2)]
+
+    old = left.iloc[pos1].reset_index(drop=True)
+    new = right.iloc[pos2].reset_index(drop=True)
+    modified = old.compare(new)
+    modified.index = right.index[pos2[modified.index.to_numpy()]]
+    return added, removed, modified
@@ -0,0 +1,221 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import threading
+from datetime import datetime
+from merkle import add_hashes
+from node_table import NodeTable
+
+
+class SnapshotStore:
+    """Content-addressed history of extracted pages, keyed by URL and timestamp.
+
+    Every node is stored once under its Merkle hash, as [Tag, Title, Class, ID, child hashes].
+    A new version only appends the nodes no earlier version already had (an unchanged
+    subtree is skipped at its root), so each pack file is a delta on the store so far.
+    Versions themselves are just the top-level hashes of the page.
+
+    Layout:
+        objects/pack-NNNNNN.ndjson   one JSON node per line
+        objects/pack-NNNNNN.idx      {hash: [offset, length]} for that pack
+        refs/<url key>.jsonl         one line per version of that URL
+    """
+
+    def __init__(self, root="history"):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.refs_dir = os.path.join(root, "refs")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.refs_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = {}
+        self._maps = {}
+        self._next_pack = 0
+        for name in sorted(os.listdir(self.objects_dir)):
+            if name.endswith(".idx"):
+                pack = name[:-len(".idx")]
+                with open(os.path.join(self.objects_dir, name), "r", encoding="utf-8") as f:
+                    for digest, (offset, length) in json.load(f).items():
+                        self._index[digest] = (pack, offset, length)
+                self._next_pack = max(self._next_pack, int(pack.split("-")[1]) + 1)
+
+    def _ref_path(self, url):
+        return os.path.join(self.refs_dir, hashlib.sha1(url.encode("utf-8")).hexdigest()[:16] + ".jsonl")
+
+    def _read(self, digest):
+        pack, offset, length = self._index[digest]
+        if pack not in self._maps:
+            with open(os.path.join(self.objects_dir, pack + ".ndjson"), "rb") as f:
+                self._maps[pack] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return json.loads(self._maps[pack][offset:offset + length])
+
+    def _write_pack(self, objects):
+        pack = f"pack-{self._next_pack:06d}"
+        self._next_pack += 1
+        entries = {}
+        offset = 0
+        with open(os.path.join(self.objects_dir, pack + ".ndjson"), "wb") as f:
+            for digest, node in objects:
+                line = json.dumps(node, ensure_ascii=False).encode("utf-8")
+                f.write(line + b"\n")
+                entries[digest] = [offset, len(line)]
+                offset += len(line) + 1
+        with open(os.path.join(self.objects_dir, pack + ".idx"), "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        for digest, (offset, length) in entries.items():
+            self._index[digest] = (pack, offset, length)
+        return pack
+
+    def put(self, url, data_dict, timestamp=None):
+        if 'Hash' not in data_dict:
+            add_hashes(data_dict)
+        hashes = list(data_dict['Hash'])                                        #Plain lists: NodeTable columns decode in one go
+        depths = list(data_dict.get('Depth') or [0] * len(hashes))
+        tags, titles, classes, ids = (list(data_dict[column]) for column in ('Tag', 'Title', 'Class', 'ID'))
+
+        children = [[] for _ in hashes]
+        top = []
+        stack = []
+        for i, depth in enumerate(depths):
+            while stack and depths[stack[-1]] >= depth:
+                stack.pop()
+            (children[stack[-1]] if stack else top).append(i)
+            stack.append(i)
+
+        with self._lock:
+            new_objects = []
+            seen = set()
+            pending = list(reversed(top))
+            while pending:
+                i = pending.pop()
+                digest = hashes[i]
+                if digest in self._index or digest in seen:
+                    continue                                                    #Whole subtree already stored
+                seen.add(digest)
+                new_objects.append((digest, [tags[i], titles[i], classes[i], ids[i],
+                                             [hashes[child] for child in children[i]]]))
+                pending.extend(reversed(children[i]))
+            if new_objects:
+                self._write_pack(new_objects)
+
+            version = {
+                "url": url,
+                "timestamp": timestamp or datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f'),
+                "root": [hashes[i] for i in top],
+                "rows": len(hashes),
+                "new_nodes": len(new_objects),
+            }
+            with open(self._ref_path(url), "a", encoding="utf-8") as f:
+                f.write(json.dumps(version) + "\n")
+        return version
+
+    def versions(self, url):
+        path = self._ref_path(url)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _find(self, url, version):
+        versions = self.versions(url)
+        if not versions:
+            raise KeyError(f"No snapshots stored for {url}")
+        if isinstance(version, int):
+            return versions[version]
+        for entry in versions:
+            if entry["timestamp"] == version:
+                return entry
+        raise KeyError(f"No snapshot of {url} at {version}")
+
+    def load(self, url, version=-1):                                            #version is a list index or a timestamp
+        entry = self._find(url, version)
+        data_dict = {'Tag': [], 'Title': [], 'Class': [], 'ID': [], 'Depth': [], 'Hash': []}
+        with self._lock:
+            pending = [(digest, 0) for digest in reversed(entry["root"])]
+            while pending:
+                digest, depth = pending.pop()
+                tag, title, classes, id_, child_hashes = self._read(digest)
+                data_dict['Tag'].append(tag)
+                data_dict['Title'].append(title)
+                data_dict['Class'].append(classes)
+                data_dict['ID'].append(id_)
+                data_dict['Depth'].append(depth)
+                data_dict['Hash'].append(digest)
+                pending.extend((child, depth + 1) for child in reversed(child_hashes))
+        return NodeTable.from_data_dict(data_dict)
+
+    def _close_maps(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps = {}
+
+    def gc(self, keep=None):
+        """Drop all but the newest `keep` versions per URL and repack only the reachable nodes."""
+        with self._lock:
+            roots = []
+            for name in os.listdir(self.refs_dir):
+                path = os.path.join(self.refs_dir, name)
+                with open(path, "r", encoding="utf-8") as f:
+                    versions = [json.loads(line) for line in f if line.strip()]
+                if keep is not None:
+                    versions = versions[-keep:] if keep > 0 else []
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.writelines(json.dumps(version) + "\n" for version in versions)
+                for version in versions:
+                    roots.extend(version["root"])
+
+            live = []
+            seen = set()
+            pending = list(roots)
+            while pending:
+                digest = pending.pop()
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                node = self._read(digest)
+                live.append((digest, node))
+                pending.extend(node[4])
+
+            before = len(self._index)
+            old_packs = {pack for pack, _, _ in self._index.values()}
+            self._close_maps()
+            self._index = {}
+            if live:
+                self._write_pack(live)
+            for pack in old_packs:
+                for suffix in (".ndjson", ".idx"):
+                    os.remove(os.path.join(self.objects_dir, pack + suffix))
+        return {"objects_before": before, "objects_after": len(live), "packs_removed": len(old_packs)}
+
+    def close(self):
+        with self._lock:
+            self._close_maps()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and compact the snapshot history store.")
+    parser.add_argument("--root", default="history")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="list stored versions of a URL")
+    list_parser.add_argument("url")
+    diff_parser = commands.add_parser("diff", help="compare two stored versions of a URL")
+    diff_parser.add_argument("url")
+    diff_parser.add_argument("old", help="version index or timestamp")
+    diff_parser.add_argument("new", help="version index or timestamp")
+    gc_parser = commands.add_parser("gc", help="drop old versions and repack reachable nodes")
+    gc_parser.add_argument("--keep", type=int, default=None, help="versions to keep per URL")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.root)
+    if args.command == "list":
+        for i, version in enumerate(store.versions(args.url)):
+            print(f"{i}\t{version['timestamp']}\t{version['rows']} rows\t{version['new_nodes']} new nodes")
+    elif args.command == "diff":
+        from Selenium import compare_history
+        to_version = lambda value: int(value) if value.lstrip("-").isdigit() else value
+        compare_history(store, args.url, to_version(args.old), to_version(args.new))
+    elif args.command == "gc":
+        print(store.gc(keep=args.keep))
+    store.close()
@@ -0,0 +1,111 @@
+import gzip
+import http.client
+import queue
+import threading
+import zlib
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (page-monitor)",
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+
+class Response:
+    __slots__ = ("url", "status", "headers", "body")
+
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def text(self):
+        charset = "utf-8"
+        content_type = self.headers.get("Content-Type", "")
+        if "charset=" in content_type:
+            charset = content_type.split("charset=")[-1].split(";")[0].strip()
+        return self.body.decode(charset, errors="replace")
+
+
+class HttpClient:
+    """Small keep-alive HTTP/1.1 client with a bounded connection pool per host."""
+
+    def __init__(self, per_host=4, timeout=15, max_redirects=5):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, key):
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = queue.LifoQueue(maxsize=self.per_host)
+            return self._pools[key]
+
+    def _connect(self, scheme, host, port):
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return connection_class(host, port, timeout=self.timeout)
+
+    def _request(self, url, headers):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        pool = self._pool(key)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        for attempt in range(2):
+            try:
+                connection = pool.get_nowait()
+                reused = True
+            except queue.Empty:
+                connection = self._connect(parts.scheme, parts.hostname, parts.port)
+                reused = False
+            try:
+                connection.request("GET", path, headers={**DEFAULT_HEADERS, **headers})
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, ConnectionError, OSError):
+                connection.close()
+                if reused and attempt == 0:
+                    continue                                                    #Server dropped an idle keep-alive connection
+                raise
+
+            if response.will_close:
+                connection.close()
+            else:
+                try:
+                    pool.put_nowait(connection)
+                except queue.Full:
+                    connection.close()
+            return response, body
+
+    def get(self, url, headers=None):
+        headers = headers or {}
+        for _ in range(self.max_redirects + 1):
+            response, body = self._request(url, headers)
+            if response.status in (301, 302, 303, 307, 308) and response.getheader("Location"):
+                url = urljoin(url, response.getheader("Location"))
+                continue
+            encoding = (response.getheader("Content-Encoding") or "").lower()
+            if encoding == "gzip":
+                body = gzip.decompress(body)
+            elif encoding == "deflate":
+                body = zlib.decompress(body)
+            return Response(url, response.status, response.msg, body)                #msg lookups are case-insensitive
+        raise http.client.HTTPException(f"Too many redirects for {url}")
+
+    def close(self):
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools = {}
+        for pool in pools:
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
@@ -0,0 +1,69 @@
+import json
+import os
+
+# Resources Chrome can skip without changing the DOM: <img>, <video> and @font-face rules
+# stay in the page, only their bytes are never fetched. Images go by resource type through
+# Chrome's content settings; the other groups are URL file-extension wildcards only, so
+# extensionless media and fonts (signed CDN URLs, HLS segments) still download.
+DEFAULT_EXTENSIONS = ("Image", "Media", "Font")
+DEFAULT_HOSTS = (
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "google-analytics.com",
+    "googletagmanager.com", "adservice.google.com", "facebook.net", "connect.facebook.net", "hotjar.com",
+    "scorecardresearch.com", "taboola.com", "outbrain.com", "criteo.com", "amazon-adsystem.com", "adnxs.com",
+)
+EXTENSIONS = {
+    "Image": ("png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico", "bmp"),
+    "Media": ("mp4", "webm", "ogg", "ogv", "mp3", "m4a", "m4v", "mov", "wav", "m3u8"),
+    "Font": ("woff", "woff2", "ttf", "otf", "eot"),
+    "Stylesheet": ("css",),
+}
+
+
+class Blocklist:
+    """Resources a lean render never downloads.
+
+    blocklist.json: {"extensions": ["Image", "Media", "Font"], "hosts": ["doubleclick.net"], "urls": ["*/beacon*"]}
+    Missing keys fall back to the defaults above, so an empty {} turns on the default lean mode.
+    "extensions" names groups of file extensions from EXTENSIONS; the old "types" key is still
+    read. Images are switched off through Chrome's content settings; every other group, host
+    and URL is a wildcard for the DevTools Network.setBlockedURLs command, set once per driver.
+    """
+
+    def __init__(self, extensions=DEFAULT_EXTENSIONS, hosts=DEFAULT_HOSTS, urls=()):
+        unknown = set(extensions) - set(EXTENSIONS)
+        if unknown:
+            raise ValueError(f"Cannot block extension groups {sorted(unknown)}, expected some of {sorted(EXTENSIONS)}")
+        self.extensions = tuple(extensions)
+        self.hosts = tuple(host.lstrip("*.") for host in hosts)
+        self.urls = tuple(urls)
+
+    @classmethod
+    def from_file(cls, path="blocklist.json"):
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        extensions = spec.get("extensions", spec.get("types", DEFAULT_EXTENSIONS))
+        return cls(extensions, spec.get("hosts", DEFAULT_HOSTS), spec.get("urls", ()))
+
+    @property
+    def blocks_images(self):                                                    #The one group blocked by type, not by extension
+        return "Image" in self.extensions
+
+    def url_patterns(self):
+        patterns = []
+        for group in self.extensions:
+            for extension in EXTENSIONS[group]:
+                patterns += [f"*.{extension}", f"*.{extension}?*"]              #With and without a query string
+        for host in self.hosts:
+            patterns += [f"*://{host}/*", f"*://*.{host}/*"]
+        return patterns + list(self.urls)
+
+    def apply_options(self, options):                                           #Before the driver starts
+        if self.blocks_images:
+            options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+    def attach(self, driver):                                                   #After it starts; holds for every later navigation
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.url_patterns()})
+        driver.blocklist = self                                                 #wait_for_settle reads it to skip image waits
@@ -0,0 +1,262 @@
+import json
+import logging
+import sys
+import time
+import metrics
+from change_events import ChangeStream, FileSink
+from settle import wait_for_settle
+
+# Installed once per page. Remembers the Tag/Title/Class/ID of every element under
+# document.body (one walk, kept in the page), then lets a MutationObserver mark what
+# changed: added and removed subtrees, and elements whose attributes, text or children
+# moved. Nothing is serialised until the next drain.
+WATCH_INSTALL_SCRIPT = """
+if (window.__pageWatch) { return false; }
+var SKIP = {script: true, style: true};
+var known = new WeakMap(), added = new Set(), dirty = new Set(), removed = [];
+function clean(text) { return text.replace(/^"+|"+$/g, ''); }
+function skipped(el) {
+    for (var up = el; up; up = up.parentElement) { if (SKIP[up.localName]) { return true; } }
+    return false;
+}
+function inBody(el) { return !!el && el !== document.body.parentElement && document.body.contains(el); }
+function state(el) {
+    var leaf = true, text = '';
+    for (var child = el.firstChild; child; child = child.nextSibling) {
+        if (child.nodeType === 1) {
+            if (!SKIP[child.localName]) { leaf = false; }
+        } else if (leaf && (child.nodeType === 3 || child.nodeType === 4)) {
+            text += child.data.trim();
+        }
+    }
+    var cls = el.getAttribute('class');
+    return {tag: el.localName,
+            title: el.localName === 'img' ? clean(el.getAttribute('alt') || '') : (leaf ? clean(text) : ''),
+            classes: cls === null ? null : cls.split(/\\s+/).filter(Boolean), id: el.getAttribute('id')};
+}
+function position(el, previous) {                                   // Earlier siblings with the same tag
+    var count = 0;
+    for (var sibling = previous; sibling; sibling = sibling.previousSibling) {
+        if (sibling.nodeType === 1 && sibling.localName === el.localName) { count++; }
+    }
+    return count;
+}
+function parts(el) {
+    var result = [];
+    for (; el && el !== document.body.parentElement; el = el.parentElement) {
+        result.unshift(el.localName + '[' + position(el, el.previousSibling) + ']');
+    }
+    return result;
+}
+function remember(root) {
+    known.set(root, state(root));
+    var all = root.getElementsByTagName('*');
+    for (var i = 0; i < all.length; i++) {
+        if (!skipped(all[i])) { known.set(all[i], state(all[i])); }
+    }
+}
+function subtree(events, op, root, rootParts) {
+    var stack = [[root, rootParts]];
+    while (stack.length) {
+        var top = stack.pop(), el = top[0], path = top[1];
+        var row = (op === 'delete' && known.get(el)) || state(el);
+        if (op === 'insert') { known.set(el, row); }
+        events.push({op: op, path: '/' + path.join('/'), tag: row.tag, row: row, depth: path.length - 1});
+        var counts = {}, children = [];
+        for (var child = el.firstElementChild; child; child = child.nextElementSibling) {
+            if (SKIP[child.localName]) { continue; }
+            var seen = counts[child.localName] || 0;
+            counts[child.localName] = seen + 1;
+            children.push([child, path.concat(child.localName + '[' + seen + ']')]);
+        }
+        for (var i = children.length - 1; i >= 0; i--) { stack.push(children[i]); }
+    }
+}
+function same(a, b) { return a === b || (a !== null && b !== null && a.join(' ') === b.join(' ')); }
+
+function handle(records) {
+    records.forEach(function (record) {
+        var target = record.type === 'characterData' ? record.target.parentElement : record.target;
+        if (!target || skipped(target)) { return; }
+        dirty.add(target);
+        if (record.type !== 'childList') { return; }
+        record.removedNodes.forEach(function (node) {
+            if (node.nodeType !== 1 || SKIP[node.localName]) { return; }
+            if (added.has(node)) { added.delete(node); return; }            // Came and went between drains
+            if (inBody(target)) {
+                removed.push([node, parts(target).concat(node.localName + '[' + position(node, record.previousSibling) + ']')]);
+            }
+        });
+        record.addedNodes.forEach(function (node) {
+            if (node.nodeType === 1 && !SKIP[node.localName]) { added.add(node); }
+        });
+    });
+}
+var observer = new MutationObserver(handle);
+
+window.__pageWatch = {
+    drain: function () {
+        handle(observer.takeRecords());                                     // Records not yet delivered to the callback
+        var events = [];
+        removed.forEach(function (entry) {
+            var node = entry[0];
+            if (inBody(node)) {                                             // Re-attached: a move if the parent changed
+                added.delete(node);
+                var from = '/' + entry[1].join('/'), to = parts(node);
+                if (from.slice(0, from.lastIndexOf('/')) !== '/' + to.slice(0, -1).join('/')) {
+                    events.push({op: 'move', tag: node.localName, from: from, to: '/' + to.join('/')});
+                }
+                return;
+            }
+            subtree(events, 'delete', node, entry[1]);
+        });
+        added.forEach(function (node) {
+            if (!inBody(node)) { return; }
+            for (var up = node.parentElement; up; up = up.parentElement) {
+                if (added.has(up)) { return; }                              // Reported with its added ancestor
+            }
+            subtree(events, 'insert', node, parts(node));
+        });
+        dirty.forEach(function (el) {
+            if (!inBody(el)) { return; }
+            var before = known.get(el), after = state(el), changes = {};
+            known.set(el, after);
+            if (!before) { return; }
+            if (before.title !== after.title) { changes.Title = [before.title, after.title]; }
+            if (!same(before.classes, after.classes)) { changes.Class = [before.classes, after.classes]; }
+            if (before.id !== after.id) { changes.ID = [before.id, after.id]; }
+            if (Object.keys(changes).length) {
+                var path = parts(el);
+                events.push({op: 'update', path: '/' + path.join('/'), tag: after.tag, changes: changes,
+                             depth: path.length - 1});
+            }
+        });
+        added.clear();
+        dirty.clear();
+        removed = [];
+        return JSON.stringify(events);
+    },
+    stop: function () { observer.disconnect(); delete window.__pageWatch; }
+};
+remember(document.body);
+observer.observe(document.body, {childList: true, subtree: true, characterData: true, attributes: true,
+                                 attributeFilter: ['class', 'id', 'alt']});
+return true;
+"""
+
+# Returns null when the watcher is gone, i.e. the tab navigated or reloaded.
+WATCH_DRAIN_SCRIPT = "return window.__pageWatch ? window.__pageWatch.drain() : null;"
+
+
+def _csv_value(field, value):                                                   #Same text as csv_rows, so events match diff_trees ops
+    if field == "Class":
+        return str(value) if value is not None else ""
+    if field == "ID":
+        return value or ""
+    return value
+
+
+def _op(event):
+    if event["op"] == "move":
+        return event
+    op = {"op": event["op"], "index": None, "path": event["path"], "tag": event["tag"]}
+    if event["op"] == "update":
+        op["changes"] = {field: {"Old": _csv_value(field, old), "New": _csv_value(field, new)}
+                         for field, (old, new) in event["changes"].items()}
+    else:
+        row = event["row"]
+        op["row"] = {"Tag": row["tag"], "Title": row["title"], "Class": _csv_value("Class", row["classes"]),
+                     "ID": _csv_value("ID", row["id"]), "Depth": str(event["depth"])}
+    return op
+
+
+class LiveWatch:
+    """Keeps one tab on a page and reports its in-place updates as change events.
+
+    Instead of reloading, re-extracting and re-diffing the whole page, a MutationObserver
+    marks what changed and each poll pulls only those elements, already coalesced: a node
+    added and removed between polls is never reported, one edited many times is reported
+    once. Ops have the diff_trees shape (insert/delete/update/move with paths) but no row
+    index, since nothing is renumbered.
+    """
+
+    def __init__(self, driver, url, interval=1.0):
+        self.driver = driver
+        self.url = url
+        self.interval = interval
+        self.polls = 0
+        self.reinstalls = 0
+
+    def start(self):
+        with metrics.bind_url(self.url):
+            with metrics.stage("get"):
+                self.driver.get(self.url)
+            with metrics.stage("settle"):
+                wait_for_settle(self.driver)
+            self._install()
+
+    def _install(self):
+        with metrics.stage("live_install", self.url):
+            self.driver.execute_script(WATCH_INSTALL_SCRIPT)
+
+    def poll(self):
+        with metrics.stage("live_poll", self.url) as span:
+            payload = self.driver.execute_script(WATCH_DRAIN_SCRIPT)
+            self.polls += 1
+            if payload is None:
+                logging.warning(f"Watcher on {self.url} was lost (page navigated or reloaded), reinstalling it")
+                self.reinstalls += 1
+                self._install()
+                return []
+            ops = [_op(event) for event in json.loads(payload)]
+            span.add(bytes=len(payload), events=len(ops))
+        return ops
+
+    def watch(self, sinks=(), duration=None, on_change=None):
+        """Polls every interval until duration runs out (forever when None); returns event counts."""
+        stream = ChangeStream(sinks)
+        deadline = time.monotonic() + duration if duration is not None else None
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                started = time.monotonic()
+                ops = self.poll()
+                for op in ops:
+                    stream.emit(op)
+                if ops:
+                    stream.flush()                                              #Consumers see each poll's changes right away
+                    if on_change is not None:
+                        on_change(self.url, ops)
+                time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+        finally:
+            stream.close()
+        return stream.counts
+
+    def stop(self):
+        try:
+            self.driver.execute_script("if (window.__pageWatch) { window.__pageWatch.stop(); }")
+        except Exception as e:
+            logging.warning(f"Error while stopping watcher on {self.url}: {e}")
+
+
+def log_live_change(url, ops):
+    counts = {}
+    for op in ops:
+        counts[op["op"]] = counts.get(op["op"], 0) + 1
+    logging.info(f"Live change on {url}: {counts}")
+
+
+def watch_url(url, duration=None, interval=1.0, sinks=None):
+    from page_fetch import new_driver
+    sinks = sinks if sinks is not None else [FileSink("data/live_changes.ndjson")]
+    with new_driver() as driver:
+        watcher = LiveWatch(driver, url, interval=interval)
+        watcher.start()
+        return watcher.watch(sinks, duration=duration, on_change=log_live_change)
+
+
+if __name__ == "__main__":
+    # python live_watch.py <url> [seconds] [poll interval]
+    url = sys.argv[1]
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    interval = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+    print(watch_url(url, duration=duration, interval=interval))
@@ -0,0 +1,66 @@
+from hashlib import blake2b
+
+DIGEST_SIZE = 16
+_NONE = "\x00"
+
+
+def node_key(tag, title, classes, id_):
+    if classes is None:
+        classes = _NONE
+    elif not isinstance(classes, str):
+        classes = "\x1e".join(classes)
+    return "\x1f".join((tag, title or "", classes, _NONE if id_ is None else id_)).encode("utf-8")
+
+
+def node_hashes(tags, titles, classes, ids, depths):
+    """Merkle hash of every node: its own Tag/Title/Class/ID followed by its children's hashes.
+
+    Rows are in document order, so one reverse pass sees every child before its parent.
+    Returns the per-row digests and the root digest over the top-level nodes.
+    """
+    hashes = [b""] * len(tags)
+    root = hash_rows(lambda i: node_key(tags[i], titles[i], classes[i], ids[i]), depths, hashes.__setitem__)
+    return hashes, root
+
+
+def hash_rows(key, depths, store):
+    """node_hashes over key(i), the node_key bytes of row i; store(i, digest) takes each row's digest.
+
+    Lets a caller write raw digests straight into its own buffer. Returns the root digest.
+    """
+    stack = []
+    for i in range(len(depths) - 1, -1, -1):
+        depth = depths[i]
+        children = []
+        while stack and stack[-1][0] > depth:
+            children.append(stack.pop()[1])
+        digest = blake2b(key(i), digest_size=DIGEST_SIZE)
+        for child in reversed(children):
+            digest.update(child)
+        digest = digest.digest()
+        store(i, digest)
+        stack.append((depth, digest))
+
+    root = blake2b(digest_size=DIGEST_SIZE)
+    for _, digest in reversed(stack):
+        root.update(digest)
+    return root.digest()
+
+
+def add_hashes(data_dict):
+    depths = data_dict.get('Depth') or [0] * len(data_dict['Tag'])
+    hashes, _ = node_hashes(data_dict['Tag'], data_dict['Title'], data_dict['Class'], data_dict['ID'], depths)
+    data_dict['Hash'] = [digest.hex() for digest in hashes]
+    return data_dict
+
+
+def root_hash(data_dict):                                                       #One digest for the whole page: equal roots mean nothing changed
+    depths = data_dict.get('Depth') or [0] * len(data_dict['Tag'])
+    if 'Hash' not in data_dict:
+        return node_hashes(data_dict['Tag'], data_dict['Title'], data_dict['Class'], data_dict['ID'], depths)[1].hex()
+    top = min(depths, default=0)
+    root = blake2b(digest_size=DIGEST_SIZE)
+    for digest, depth in zip(data_dict['Hash'], depths):
+        if depth == top:
+            root.update(bytes.fromhex(digest))
+    return root.hexdigest()
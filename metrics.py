@@ -0,0 +1,213 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+try:
+    import resource
+except ImportError:                                                             #Not available on Windows
+    resource = None
+
+_enabled = os.environ.get("PAGE_METRICS", "") not in ("", "0")
+_max_spans = int(os.environ.get("PAGE_METRICS_MAX_SPANS", "") or 100_000)
+_spans = deque(maxlen=_max_spans)                                               #Newest spans only, for the trace
+_totals = {}                                                                    #(stage, url) -> running sums, for Prometheus
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _totals.clear()
+
+
+def take():                                                                     #Hand spans recorded in a worker process back to the parent
+    with _lock:
+        spans = list(_spans)
+        _spans.clear()
+        _totals.clear()
+    return spans
+
+
+def merge(spans):
+    with _lock:
+        for span in spans:
+            _record(span)
+
+
+def _record(span):                                                              #Caller holds _lock
+    _spans.append(span)
+    entry = _totals.setdefault((span.name, span.url or ""), {"calls": 0, "errors": 0, "wall": 0, "cpu": 0, "rss": 0,
+                                                             "rss_delta": 0, "counts": {}})
+    entry["calls"] += 1
+    entry["errors"] += span.error
+    entry["wall"] += span.duration
+    entry["cpu"] += span.cpu
+    entry["rss"] = max(entry["rss"], span.rss)
+    entry["rss_delta"] = max(entry["rss_delta"], span.rss_delta)
+    for key, value in span.counts.items():
+        entry["counts"][key] = entry["counts"].get(key, 0) + value
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss():
+    """Current resident set size in bytes.
+
+    Read from /proc/self/statm where there is one; elsewhere falls back to the process peak
+    (ru_maxrss), which can only grow, so deltas there understate what a stage freed.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024                    #ru_maxrss is KiB on Linux, bytes on macOS
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, **counts):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "url", "counts", "start", "cpu_start", "duration", "cpu", "rss_start", "rss", "rss_delta", "pid",
+                 "tid", "error")
+
+    def __init__(self, name, url, counts):
+        self.name = name
+        self.url = url
+        self.counts = counts
+
+    def add(self, **counts):                                                    #e.g. span.add(bytes=len(html), rows=n)
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def __enter__(self):
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.rss_start = _rss()
+        self.cpu_start = time.thread_time_ns()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter_ns() - self.start
+        self.cpu = time.thread_time_ns() - self.cpu_start
+        self.rss = _rss()
+        self.rss_delta = self.rss - self.rss_start                              #Other threads' allocations land here too
+        self.error = exc_type is not None
+        with _lock:
+            _record(self)
+        return False
+
+
+def stage(name, url=None, **counts):
+    """Times one stage: wall and CPU time, RSS before and after, plus any byte/row counts added.
+
+    Returns a shared no-op object when metrics are disabled, so instrumented code pays
+    one function call and a flag check.
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, url or getattr(_local, "url", None), counts)
+
+
+class bind_url:
+    """Attributes stages started on this thread to url until the block exits."""
+
+    def __init__(self, url):
+        self.url = url
+
+    def __enter__(self):
+        self.previous = getattr(_local, "url", None)
+        _local.url = self.url
+
+    def __exit__(self, *exc):
+        _local.url = self.previous
+        return False
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def prometheus_text():
+    with _lock:
+        totals = {key: dict(entry, counts=dict(entry["counts"])) for key, entry in _totals.items()}
+
+    series = [
+        ("page_stage_calls_total", "counter", "Times the stage ran.", lambda e: e["calls"]),
+        ("page_stage_errors_total", "counter", "Runs of the stage that raised.", lambda e: e["errors"]),
+        ("page_stage_wall_seconds_total", "counter", "Wall-clock time spent in the stage.", lambda e: e["wall"] / 1e9),
+        ("page_stage_cpu_seconds_total", "counter", "Thread CPU time spent in the stage.", lambda e: e["cpu"] / 1e9),
+        ("page_stage_rss_bytes", "gauge", "Largest process RSS seen as the stage finished.", lambda e: e["rss"]),
+        ("page_stage_rss_growth_bytes", "gauge", "Largest RSS growth over one run of the stage.",
+         lambda e: e["rss_delta"]),
+    ]
+    lines = []
+    for metric, kind, help_text, value in series:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for (name, url), entry in sorted(totals.items()):
+            lines.append(f'{metric}{{stage="{_escape(name)}",url="{_escape(url)}"}} {value(entry)}')
+    count_keys = sorted({key for entry in totals.values() for key in entry["counts"]})
+    for key in count_keys:
+        metric = f"page_stage_{key}_total"
+        lines.append(f"# HELP {metric} {key} handled by the stage.")
+        lines.append(f"# TYPE {metric} counter")
+        for (name, url), entry in sorted(totals.items()):
+            if key in entry["counts"]:
+                lines.append(f'{metric}{{stage="{_escape(name)}",url="{_escape(url)}"}} {entry["counts"][key]}')
+    return "\n".join(lines) + "\n"
+
+
+def trace_events():
+    """Spans as Chrome trace "complete" events, loadable in chrome://tracing or Perfetto."""
+    with _lock:
+        spans = list(_spans)
+    return {"traceEvents": [
+        {"name": span.name, "cat": "stage", "ph": "X", "pid": span.pid, "tid": span.tid,
+         "ts": span.start / 1000, "dur": span.duration / 1000,
+         "args": dict(span.counts, url=span.url, cpu_ms=round(span.cpu / 1e6, 3), rss=span.rss,
+                      rss_delta=span.rss_delta, error=span.error)}
+        for span in spans
+    ], "displayTimeUnit": "ms"}
+
+
+def write_reports(directory="metrics"):
+    os.makedirs(directory, exist_ok=True)
+    prom_path = os.path.join(directory, "metrics.prom")
+    trace_path = os.path.join(directory, "trace.json")
+    with open(prom_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    with open(trace_path, "w", encoding="utf-8") as f:
+        json.dump(trace_events(), f)
+    return prom_path, trace_path
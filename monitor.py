@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import logging
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from page_fetch import csv_rows, fetch_rows, http_client, new_driver
+from driver_pool import DriverPool
+from tree_diff import diff_trees
+
+
+class Target:
+    __slots__ = ("url", "interval", "precheck", "etag", "last_modified", "body_hash", "pending", "rows", "queued",
+                 "checks", "renders")
+
+    def __init__(self, url, interval=300, precheck=True):
+        self.url = url
+        self.interval = interval
+        self.precheck = precheck
+        self.etag = None
+        self.last_modified = None
+        self.body_hash = None
+        self.pending = None                                                     #Validators of a change not rendered yet
+        self.rows = None
+        self.queued = False
+        self.checks = 0
+        self.renders = 0
+
+
+def conditional_get(url, etag=None, last_modified=None):
+    """Plain HTTP GET with If-None-Match/If-Modified-Since. Returns (status, etag, last_modified, body)."""
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    response = http_client.get(url, headers)                                    #Shared keep-alive pool
+    if response.status == 304:
+        return 304, etag, last_modified, None
+    if response.status >= 400:
+        raise OSError(f"HTTP {response.status} for {url}")
+    return response.status, response.headers.get("ETag"), response.headers.get("Last-Modified"), response.body
+
+
+class HostLimiter:
+    """Caps concurrent requests per host and spaces them at least 1/rate seconds apart."""
+
+    def __init__(self, concurrency=2, rate=1.0):
+        self.concurrency = concurrency
+        self.rate = rate
+        self._semaphores = {}
+        self._locks = {}
+        self._next_slot = {}
+
+    async def __call__(self, host):
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.concurrency))
+        await semaphore.acquire()
+        if self.rate:
+            lock = self._locks.setdefault(host, asyncio.Lock())
+            async with lock:
+                now = time.monotonic()
+                start = max(now, self._next_slot.get(host, now))
+                self._next_slot[host] = start + 1.0 / self.rate
+            await asyncio.sleep(start - now)
+        return semaphore
+
+
+class Monitor:
+    """Long-running scheduler that re-checks every target on its own interval.
+
+    Each due target first gets a conditional HTTP pre-check; only when that reports a
+    change, or fails (a 403 to non-browser clients, a TLS error), is a render job queued.
+    Pre-checks and renders of one host share its HostLimiter slots. The render queue is
+    bounded, so when the browsers fall behind, schedulers wait on it instead of piling up
+    work.
+    """
+
+    def __init__(self, targets, render, on_change=None, render_workers=2, queue_size=None,
+                 host_concurrency=2, host_rate=1.0, jitter=0.1, store=None):
+        self.targets = list(targets)
+        self.render = render
+        self.on_change = on_change or log_change
+        self.render_workers = render_workers
+        self.queue_size = queue_size or render_workers * 2
+        self.limiter = HostLimiter(host_concurrency, host_rate)
+        self.jitter = jitter
+        self.store = store
+        self.stats = {"checks": 0, "not_modified": 0, "same_body": 0, "renders": 0, "changed": 0, "errors": 0}
+        self._http_executor = ThreadPoolExecutor(max_workers=host_concurrency * 4)
+        self._render_executor = ThreadPoolExecutor(max_workers=render_workers)
+
+    async def _precheck(self, target):
+        loop = asyncio.get_running_loop()
+        semaphore = await self.limiter(urlsplit(target.url).hostname)
+        try:
+            status, etag, last_modified, body = await loop.run_in_executor(
+                self._http_executor, conditional_get, target.url, target.etag, target.last_modified)
+        finally:
+            semaphore.release()
+
+        if status == 304:
+            self.stats["not_modified"] += 1
+            return False
+        body_hash = hashlib.blake2b(body, digest_size=16).hexdigest()
+        if body_hash == target.body_hash:
+            self.stats["same_body"] += 1
+            return False
+        target.pending = (etag, last_modified, body_hash)                       #Kept only once the render succeeds
+        return True
+
+    async def _schedule(self, target, queue):
+        await asyncio.sleep(random.uniform(0, self.jitter * target.interval))       #Spread the first round out
+        while True:
+            started = time.monotonic()
+            target.checks += 1
+            self.stats["checks"] += 1
+            try:
+                changed = await self._precheck(target) if target.precheck else True
+            except Exception as e:                                              #The browser may still get through
+                self.stats["errors"] += 1
+                logging.warning(f"Pre-check failed for URL {target.url}, rendering instead: {e}")
+                changed = True
+            if (changed or target.rows is None) and not target.queued:
+                target.queued = True
+                await queue.put(target)                                         #Blocks while the render queue is full
+            delay = target.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            await asyncio.sleep(max(0.0, delay - (time.monotonic() - started)))
+
+    async def _render_worker(self, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            target = await queue.get()
+            try:
+                semaphore = await self.limiter(urlsplit(target.url).hostname)   #Same per-host cap as the pre-checks
+                try:
+                    rows = await loop.run_in_executor(self._render_executor, self.render, target.url)
+                finally:
+                    semaphore.release()
+                target.renders += 1
+                self.stats["renders"] += 1
+                if rows is None:
+                    target.pending = None                                       #Next pre-check sees the change again
+                else:
+                    if self.store is not None:
+                        await loop.run_in_executor(self._render_executor, self.store.put, target.url, rows)
+                    if target.rows is not None:
+                        ops = await loop.run_in_executor(self._render_executor, diff_rows, target.rows, rows)
+                        if ops:
+                            self.stats["changed"] += 1
+                            self.on_change(target.url, ops)
+                    target.rows = rows
+                    if target.pending is not None:
+                        target.etag, target.last_modified, target.body_hash = target.pending
+                        target.pending = None
+            except Exception as e:
+                target.pending = None
+                self.stats["errors"] += 1
+                logging.error(f"Error while rendering URL {target.url}: {e}")
+            finally:
+                target.queued = False
+                queue.task_done()
+
+    async def run(self, duration=None):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        tasks = [asyncio.create_task(self._render_worker(queue)) for _ in range(self.render_workers)]
+        tasks += [asyncio.create_task(self._schedule(target, queue)) for target in self.targets]
+        try:
+            if duration is None:
+                await asyncio.gather(*tasks)
+            else:
+                await asyncio.sleep(duration)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._http_executor.shutdown(wait=False)
+            self._render_executor.shutdown(wait=False)
+        return self.stats
+
+
+def diff_rows(rows1, rows2):
+    return diff_trees(csv_rows(rows1), csv_rows(rows2))
+
+
+def log_change(url, ops):
+    counts = {}
+    for op in ops:
+        counts[op["op"]] = counts.get(op["op"], 0) + 1
+    logging.info(f"Change detected on {url}: {counts}")
+
+
+def run_monitor(targets, workers=2, duration=None, mode="browser", **kwargs):
+    with DriverPool(new_driver, size=workers) as pool:
+        render = lambda url: fetch_rows(url, 0, pool=pool, save=False, mode=mode)[0]
+        monitor = Monitor(targets, render, render_workers=workers, **kwargs)
+        return asyncio.run(monitor.run(duration=duration))
+
+
+if __name__ == "__main__":
+    # Each line of the file is "<url> [interval seconds]".
+    targets = []
+    with open(sys.argv[1] if len(sys.argv) > 1 else "urls.txt", "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if parts and not parts[0].startswith("#"):
+                targets.append(Target(parts[0], float(parts[1]) if len(parts) > 1 else 300))
+    print(run_monitor(targets))
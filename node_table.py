@@ -0,0 +1,344 @@
+from array import array
+import numpy as np
+from merkle import DIGEST_SIZE, hash_rows, node_key, root_hash
+
+HAS_CLASS = 1
+HAS_ID = 2
+
+COLUMNS = ("Tag", "Title", "Class", "ID", "Depth", "Hash")
+
+
+def _smallest(values, limit, small, large):                                     #Narrowest dtype that holds every value below limit
+    return np.array(values, dtype=small if limit < np.iinfo(small).max else large)
+
+
+def _encode_strings(values):
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return _smallest(offsets, offsets[-1], "<u4", "<i8"), np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _decode_strings(offsets, data):
+    buffer = data.tobytes()
+    offsets = offsets.tolist()
+    return [buffer[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+
+
+class TableBuilder:
+    """Appends rows straight into NodeTable's typed buffers, so no dict of lists is ever built.
+
+    Tag and class names are interned into codes as rows arrive and IDs go into one UTF-8
+    buffer with offsets. Titles, which an extractor only knows once the element closes, are
+    kept as references (mostly the shared "") until build() encodes them. build() hashes the
+    rows straight into the raw digest buffer.
+    """
+
+    def __init__(self):
+        self.tag_table = {}
+        self.class_table = {}
+        self.tags = array("I")
+        self.flags = bytearray()
+        self.depths = array("i")
+        self.titles = []
+        self.class_offsets = array("q", [0])
+        self.class_codes = array("I")
+        self.id_offsets = array("q", [0])
+        self.id_data = bytearray()
+
+    def __len__(self):
+        return len(self.tags)
+
+    def append(self, tag, title, classes, id_, depth):                          #Returns the row index, for set_title
+        tag_table = self.tag_table
+        self.tags.append(tag_table.setdefault(tag, len(tag_table)))
+        flags = 0
+        if classes is not None:
+            flags |= HAS_CLASS
+            class_table = self.class_table
+            self.class_codes.extend(class_table.setdefault(name, len(class_table)) for name in classes)
+        self.class_offsets.append(len(self.class_codes))
+        if id_ is not None:
+            flags |= HAS_ID
+            self.id_data += id_.encode("utf-8")
+        self.id_offsets.append(len(self.id_data))
+        self.flags.append(flags)
+        self.depths.append(depth)
+        self.titles.append(title)
+        return len(self.tags) - 1
+
+    def set_title(self, row, title):
+        self.titles[row] = title
+
+    def _key(self, tag_names, class_names):
+        tags, titles, flags = self.tags, self.titles, self.flags
+        class_offsets, class_codes = self.class_offsets, self.class_codes
+        id_offsets, id_data = self.id_offsets, self.id_data
+
+        def key(i):
+            classes = ([class_names[code] for code in class_codes[class_offsets[i]:class_offsets[i + 1]]]
+                       if flags[i] & HAS_CLASS else None)
+            id_ = id_data[id_offsets[i]:id_offsets[i + 1]].decode("utf-8") if flags[i] & HAS_ID else None
+            return node_key(tag_names[tags[i]], titles[i], classes, id_)
+        return key
+
+    def build(self, hashes=None):
+        """The NodeTable; hashes, hex digests per row, are taken as given instead of computed."""
+        tag_names, class_names = list(self.tag_table), list(self.class_table)
+        count = len(self.tags)
+        hash_buffer = bytearray(count * DIGEST_SIZE)
+        if hashes is None:
+
+            def store(i, digest):
+                hash_buffer[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE] = digest
+            root = hash_rows(self._key(tag_names, class_names), self.depths, store).hex()
+        else:
+            for i, digest in enumerate(hashes):
+                hash_buffer[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE] = bytes.fromhex(digest)
+            root = None
+
+        depths = np.frombuffer(self.depths, dtype=np.int32).astype("<i4")
+        if depths.min(initial=0) >= 0:
+            depths = _smallest(depths, depths.max(initial=0), "<u2", "<i4")
+        title_offsets, title_data = _encode_strings(self.titles)
+        columns = {
+            "tag": _smallest(self.tags, len(tag_names), "<u2", "<i4"),
+            "flags": np.frombuffer(bytes(self.flags), dtype=np.uint8),
+            "depth": depths,
+            "title_offsets": title_offsets,
+            "title_data": title_data,
+            "id_offsets": _smallest(self.id_offsets, self.id_offsets[-1], "<u4", "<i8"),
+            "id_data": np.frombuffer(bytes(self.id_data), dtype=np.uint8),
+            "class_offsets": _smallest(self.class_offsets, len(self.class_codes), "<u4", "<i8"),
+            "class_codes": _smallest(self.class_codes, len(class_names), "<u2", "<i4"),
+            "hash": np.frombuffer(bytes(hash_buffer), dtype=np.uint8),
+        }
+        return NodeTable(columns, tag_names, class_names, root)
+
+
+class Column:
+    """Read-only sequence over one NodeTable column, so table['Title'][i] works like a list."""
+
+    __slots__ = ("table", "name")
+
+    def __init__(self, table, name):
+        self.table = table
+        self.name = name
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.tolist()[i]
+        if i < 0:
+            i += len(self.table)
+        if not 0 <= i < len(self.table):
+            raise IndexError(f"{self.name} row {i} out of range")
+        return self.table.value(self.name, i)
+
+    def __iter__(self):                                                         #Decodes the whole column at once, much faster than per row
+        return iter(self.tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.table.columns["depth"] if self.name == "Depth" else self.tolist(), dtype=dtype)
+
+    def tolist(self):
+        return self.table.column(self.name)
+
+
+class Row:
+    """One row as csv_rows gives it (Class and Depth as text, "" for a missing ID), without the dict."""
+
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, key):
+        if key not in COLUMNS:
+            raise KeyError(key)
+        return self.table.csv_value(key, self.index)
+
+    def get(self, key, default=None):
+        return self[key] if key in COLUMNS else default
+
+    def __contains__(self, key):
+        return key in COLUMNS
+
+    def keys(self):
+        return COLUMNS
+
+    def __iter__(self):
+        return iter(COLUMNS)
+
+    def __len__(self):
+        return len(COLUMNS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class Rows:
+    """csv_rows of a NodeTable: a sequence of Row views plus whole-column access for the diff."""
+
+    __slots__ = ("table",)
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [Row(self.table, j) for j in range(len(self.table))[i]]
+        if i < 0:
+            i += len(self.table)
+        if not 0 <= i < len(self.table):
+            raise IndexError(f"row {i} out of range")
+        return Row(self.table, i)
+
+    def __iter__(self):
+        return (Row(self.table, i) for i in range(len(self.table)))
+
+    def column(self, name):                                                     #Same values as [row[name] for row in rows]
+        return self.table.csv_column(name)
+
+
+class NodeTable:
+    """Extracted page held as typed arrays instead of one Python object per cell.
+
+    Tags and class names are interned as integer codes, Title and ID text sits in one UTF-8
+    buffer per column with offsets, hashes are raw 16-byte digests, and every array uses the
+    narrowest integer type its values fit. The layout is the snapshot file layout, so writing
+    a snapshot is a straight copy and a snapshot can be read back as a table without decoding. table['Tag'] and friends give
+    list-like columns, and rows() gives __slots__ row views in the csv_rows format.
+    """
+
+    def __init__(self, columns, tag_names, class_names, root_hash=None):
+        self.columns = columns
+        self.tag_names = tag_names
+        self.class_names = class_names
+        self._root_hash = root_hash
+
+    @classmethod
+    def from_data_dict(cls, data_dict):
+        if isinstance(data_dict, NodeTable):
+            return data_dict
+        builder = TableBuilder()
+        depths = data_dict.get('Depth') or [0] * len(data_dict['Tag'])
+        for tag, title, classes, id_, depth in zip(data_dict['Tag'], data_dict['Title'], data_dict['Class'],
+                                                   data_dict['ID'], depths):
+            builder.append(tag, title, classes, id_, depth)
+        return builder.build(data_dict.get('Hash'))
+
+    def __len__(self):
+        return len(self.columns["tag"])
+
+    @property
+    def root_hash(self):
+        if self._root_hash is None:
+            self._root_hash = root_hash(self)
+        return self._root_hash
+
+    def tag(self, i):
+        return self.tag_names[self.columns["tag"][i]]
+
+    def _string(self, name, i):
+        offsets = self.columns[f"{name}_offsets"]
+        return self.columns[f"{name}_data"][offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+    def title(self, i):
+        return self._string("title", i)
+
+    def classes(self, i):
+        if not self.columns["flags"][i] & HAS_CLASS:
+            return None
+        offsets = self.columns["class_offsets"]
+        return [self.class_names[code] for code in self.columns["class_codes"][offsets[i]:offsets[i + 1]]]
+
+    def id(self, i):
+        return self._string("id", i) if self.columns["flags"][i] & HAS_ID else None
+
+    def depth(self, i):
+        return int(self.columns["depth"][i])
+
+    def hash(self, i):
+        return self.columns["hash"][i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE].tobytes().hex()
+
+    def value(self, name, i):
+        return getattr(self, _ACCESSORS[name])(i)
+
+    def csv_value(self, name, i):
+        value = self.value(name, i)
+        if name == "Class":
+            return str(value) if value is not None else ""
+        if name == "ID":
+            return value or ""
+        return str(value) if name == "Depth" else value
+
+    def column(self, name):
+        columns = self.columns
+        if name == "Tag":
+            return [self.tag_names[code] for code in columns["tag"].tolist()]
+        if name == "Title":
+            return _decode_strings(columns["title_offsets"], columns["title_data"])
+        if name == "ID":
+            has_id = (columns["flags"] & HAS_ID).astype(bool).tolist()
+            return [id_ if present else None
+                    for id_, present in zip(_decode_strings(columns["id_offsets"], columns["id_data"]), has_id)]
+        if name == "Class":
+            names = [self.class_names[code] for code in columns["class_codes"].tolist()]
+            offsets = columns["class_offsets"].tolist()
+            has_class = (columns["flags"] & HAS_CLASS).astype(bool).tolist()
+            return [names[start:end] if present else None
+                    for start, end, present in zip(offsets, offsets[1:], has_class)]
+        if name == "Depth":
+            return columns["depth"].tolist()
+        if name == "Hash":
+            return columns["hash"].tobytes().hex(" ", DIGEST_SIZE).split() if len(columns["hash"]) else []
+        raise KeyError(name)
+
+    def csv_column(self, name):
+        values = self.column(name)
+        if name == "Class":
+            return [str(value) if value is not None else "" for value in values]
+        if name == "ID":
+            return [value or "" for value in values]
+        return [str(value) for value in values] if name == "Depth" else values
+
+    # Mapping-style access, so code written against the old dict-of-lists keeps working.
+    def keys(self):
+        return COLUMNS if len(self.columns["hash"]) or not len(self) else COLUMNS[:-1]
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+    def __getitem__(self, name):
+        if name not in self.keys():
+            raise KeyError(name)
+        return Column(self, name)
+
+    def get(self, name, default=None):
+        return self[name] if name in self.keys() else default
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+    def rows(self):
+        return Rows(self)
+
+    def to_data_dict(self):
+        return {name: self.column(name) for name in self.keys()}
+
+    def copy(self):                                                             #Detached from whatever buffer the columns view
+        return NodeTable({name: np.array(array) for name, array in self.columns.items()}, list(self.tag_names),
+                         list(self.class_names), self._root_hash)
+
+    def nbytes(self):
+        return sum(array.nbytes for array in self.columns.values())
+
+
+_ACCESSORS = {"Tag": "tag", "Title": "title", "Class": "classes", "ID": "id", "Depth": "depth", "Hash": "hash"}
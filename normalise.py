@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import re
+import numpy as np
+import metrics
+from node_table import NodeTable
+from scope import select_rows, subtree_mask, take_rows
+
+try:
+    import ahocorasick                                                          #pyahocorasick, optional
+except ImportError:
+    ahocorasick = None
+
+COLUMNS = ("Title", "Class", "ID")
+
+
+class _LiteralSet:
+    """Substring search over many literals: an Aho-Corasick automaton when pyahocorasick
+    is installed, otherwise one alternation regex."""
+
+    def __init__(self, literals):
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for literal in literals:
+                self._automaton.add_word(literal, literal)
+            self._automaton.make_automaton()
+            self._pattern = None
+        else:
+            self._automaton = None
+            self._pattern = re.compile("|".join(re.escape(literal) for literal in sorted(literals, key=len, reverse=True)))
+
+    def matching(self, values):                                                 #Values containing any literal, in one scan
+        values = list(values)
+        text = "\0".join(values)
+        if self._automaton is not None:
+            ends = (end for end, _ in self._automaton.iter(text))
+        else:
+            ends = (match.end() - 1 for match in self._pattern.finditer(text))
+        starts = np.cumsum([0] + [len(value) + 1 for value in values])
+        return {values[i] for i in set(np.searchsorted(starts, list(ends), side="right") - 1)}
+
+
+class Rule:
+    """One compiled normalisation rule.
+
+    regex     columns, pattern, replace        rewrites matching values (or each class name)
+    literals  columns, literals, replace       masks values containing any literal
+    selector  selectors                        matches nodes with tag/.class/#id selectors
+    Any rule with "action": "drop" removes the matched node and its subtree instead.
+    """
+
+    def __init__(self, spec, index=0):
+        self.name = spec.get("name") or f"{spec['type']}-{index}"             #Unnamed rules still get their own stats bucket
+        self.type = spec["type"]
+        self.action = spec.get("action", "mask")
+        self.columns = [column for column in spec.get("columns", COLUMNS) if column in COLUMNS]
+        self.replace = spec.get("replace", "")
+        if self.type == "regex":
+            self._pattern = re.compile(spec["pattern"])
+        elif self.type == "literals":
+            self._literals = _LiteralSet(spec["literals"])
+        elif self.type == "selector":
+            self.selectors = list(spec["selectors"])
+        else:
+            raise ValueError(f"Unknown noise rule type {self.type!r} in rule {self.name!r}")
+
+    def mapping(self, values):
+        """Rewrites only the distinct values, so cost follows cardinality, not row count."""
+        if self.type == "literals":
+            return dict.fromkeys(self._literals.matching(values), self.replace)
+        search, subn = self._pattern.search, self._pattern.subn
+        return {value: subn(self.replace, value)[0] for value in values if search(value)}
+
+
+class Normaliser:
+    """Masks or drops volatile values between extraction and diff.
+
+    Rules are compiled once. Each rule runs over the distinct values of a column, and the
+    result is mapped back onto the rows, so millions of rows with repetitive classes and
+    IDs cost little more than the unique values do.
+    """
+
+    def __init__(self, rules):
+        self.rules = [rule if isinstance(rule, Rule) else Rule(rule, index) for index, rule in enumerate(rules)]
+
+    @classmethod
+    def from_file(cls, path="noise_rules.json"):
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _apply_masks(self, data_dict, rule, stats, dropped):
+        for column in rule.columns:
+            values = data_dict[column]
+            if column == "Class":
+                distinct = {name for classes in values if classes for name in classes}
+                changed = rule.mapping(distinct)
+                hits = [i for i, classes in enumerate(values) if classes and not changed.keys().isdisjoint(classes)]
+            else:
+                distinct = set(values)
+                distinct.discard(None)
+                distinct.discard("")
+                changed = rule.mapping(distinct)
+                hits = [i for i, value in enumerate(values) if value in changed] if changed else []
+            stats[rule.name] += len(hits)
+            if rule.action == "drop":
+                dropped.extend(hits)
+            elif column == "Class":
+                for i in hits:
+                    values[i] = [new for new in (changed.get(name, name) for name in values[i]) if new]
+            else:
+                if column == "ID":                                              #An emptied ID is no ID
+                    changed = {value: new or None for value, new in changed.items()}
+                for i in hits:
+                    values[i] = changed[values[i]]
+
+    def apply(self, data_dict):
+        """Returns (normalised rows, {rule name: rows masked or subtrees dropped})."""
+        original = data_dict
+        data_dict = {column: list(values) for column, values in data_dict.items() if column != 'Hash'}
+        stats = {rule.name: 0 for rule in self.rules}
+        dropped = []
+        for rule in self.rules:
+            if rule.type == "selector":
+                matched = select_rows(data_dict, rule.selectors)
+                if rule.action == "drop":
+                    dropped.extend(matched)
+                else:
+                    for i in matched:
+                        for column in rule.columns:
+                            data_dict[column][i] = None if column != "Title" else rule.replace
+                stats[rule.name] += len(matched)
+            else:
+                self._apply_masks(data_dict, rule, stats, dropped)
+
+        stats["rows_dropped"] = 0
+        if not any(stats.values()):
+            return original, stats                                              #Nothing matched, keep the existing hashes
+        if not dropped:
+            return NodeTable.from_data_dict(data_dict), stats
+        keep = ~subtree_mask(data_dict['Depth'], sorted(set(dropped)))
+        stats["rows_dropped"] = int((~keep).sum())
+        return take_rows(data_dict, np.flatnonzero(keep)), stats
+
+
+def normalise_rows(normaliser, data_dict, url=None):                            #No-op when no rules are configured
+    if normaliser is None:
+        return data_dict
+    with metrics.stage("normalise", rows=len(data_dict['Tag'])):
+        data_dict, stats = normaliser.apply(data_dict)
+    if any(stats.values()):
+        logging.info(f"Noise removed{' for ' + url if url else ''}: {stats}")
+    return data_dict
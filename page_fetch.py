@@ -0,0 +1,244 @@
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+from selenium import webdriver
+import pandas as pd
+import metrics
+from extract import DOM_EXTRACT_SCRIPT, extract_rows, rows_from_payload, strip_scripts
+from http_client import HttpClient
+from lean import Blocklist
+from node_table import NodeTable
+from normalise import Normaliser, normalise_rows
+from render_cache import cache_key
+from render_classifier import RenderClassifier
+from scope import load_scopes, scope_rows
+from settle import wait_for_settle
+from snapshot import write_snapshot
+
+# One page, one path: decide how to fetch it, load it (browser or plain GET), extract the
+# rows and write the outputs. Selenium.fetch_batch runs it all on one thread per page;
+# pipeline.Pipeline runs the browser half on its render threads and ships the payload to
+# extract_payload in a worker process.
+
+options = webdriver.ChromeOptions()
+options.add_argument("--disable-logging")
+options.add_argument("--headless")
+resource_blocklist = Blocklist.from_file("blocklist.json")                      #Lean render when present: no images, media, fonts, ads
+if resource_blocklist is not None:
+    resource_blocklist.apply_options(options)
+
+logging.basicConfig(format='%(asctime)s - %(message)s', level=logging.INFO)
+
+archive_executor = ThreadPoolExecutor(max_workers=1)
+http_client = HttpClient()
+render_classifier = RenderClassifier("data/render_classifier.json")
+url_scopes = load_scopes("scopes.json")                                         #{url: {"include": [...], "exclude": [...]}}
+noise_rules = Normaliser.from_file("noise_rules.json")                          #None when there is no rules file
+MODES = ("browser", "source", "static", "auto")                                 #In-browser walk, page_source parse, plain GET, classifier
+
+
+def new_driver():
+    with metrics.stage("driver_start"):
+        driver = webdriver.Chrome(options=options)
+        if resource_blocklist is not None:
+            resource_blocklist.attach(driver)
+        return driver
+
+
+def load_elements(driver, quiet_ms=500, timeout=15):
+    print("Waiting for the page to settle...")
+    with metrics.stage("settle") as span:
+        result = wait_for_settle(driver, quiet_ms=quiet_ms, timeout=timeout)    #Returns once DOM and network have been quiet for quiet_ms
+        span.add(bytes=result.get('transferred_bytes', 0))
+    print(f"Page settled in {result['elapsed_ms']} ms after {result['mutations']} mutations "
+          f"and {result['lazy_loads']} lazy loads ({result.get('transferred_bytes', 0)} bytes transferred).")
+
+
+def save_snapshot(data_dict, file_index):                                       #Primary output: columnar, memory-mappable snapshot
+    snapshot_path = f"data/test{file_index}.snap"
+    with metrics.stage("snapshot_write", rows=len(data_dict['Tag'])) as span:
+        write_snapshot(data_dict, snapshot_path)
+        span.add(bytes=os.path.getsize(snapshot_path))
+    print(f"Snapshot saved successfully as {snapshot_path}.")
+    return snapshot_path
+
+
+def save_csv(data_dict, file_index):
+    csv_path = f"data/test{file_index}.csv"
+    with metrics.stage("csv_write", rows=len(data_dict['Tag'])) as span:
+        df = pd.DataFrame(data={column: list(values) for column, values in data_dict.items()
+                                if column != 'Hash'})                           #Subtree hashes stay in the .snap; CSV keeps its columns
+        df.to_csv(csv_path, index=False)
+        span.add(bytes=os.path.getsize(csv_path))
+    print(f"Data saved successfully as {csv_path}.")
+    return csv_path
+
+
+def csv_rows(data_dict):                                                        #Rows as they read back from data/test{i}.csv
+    if isinstance(data_dict, NodeTable):
+        return data_dict.rows()                                                 #Row views, no dict per row
+    rows = [
+        {"Tag": tag, "Title": title, "Class": str(classes) if classes is not None else "", "ID": id_ or ""}
+        for tag, title, classes, id_ in zip(data_dict['Tag'], data_dict['Title'], data_dict['Class'], data_dict['ID'])
+    ]
+    for row, depth in zip(rows, data_dict.get('Depth', ())):
+        row["Depth"] = str(depth)
+    for row, digest in zip(rows, data_dict.get('Hash', ())):
+        row["Hash"] = digest
+    return rows
+
+
+def duplicate_result(result, file_index):                                       #Same URL again in a batch: copy its outputs, no second render
+    copy = dict(result, index=file_index)
+    for key, extension in (("snapshot_path", "snap"), ("csv_path", "csv")):
+        if result.get(key):
+            copy[key] = shutil.copyfile(result[key], f"data/test{file_index}.{extension}")
+    return copy
+
+
+def archive_html(html_doc, file_index):                                         #Optional side output, written off the hot path
+    file_path = f"data/elements{file_index}.html"
+
+    def write():
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(html_doc)
+        return file_path
+
+    def log_failure(future):                                                    #Nobody waits on the future, so say it here
+        if future.exception() is not None:
+            logging.error(f"Could not archive {file_path}: {future.exception()}")
+
+    future = archive_executor.submit(write)
+    future.add_done_callback(log_failure)
+    return future
+
+
+def plan_fetch(url, mode):
+    """(fetch static HTML, render mode or None) for the next fetch of url in the given mode."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+    if mode == "static":
+        return True, None
+    if mode == "auto":                                                          #Render only when the classifier says the page needs JS
+        use_static, use_render = render_classifier.plan(url)
+        return use_static, "browser" if use_render else None
+    return False, mode
+
+
+def render_page(driver, url, file_index, archive=False, mode="browser", scope=None, visual=None, links=None):
+    """Browser half of a render: loads url and returns (payload, final URL) for extract_payload.
+
+    The payload is the DOM_EXTRACT_SCRIPT JSON in "browser" mode, already scoped and with
+    the page's links when links is not None, and page_source otherwise.
+    """
+    with metrics.stage("get"):
+        driver.get(url)
+    print(f"Loading page: {url}")
+    print(f"Extracting rows for file index {file_index}...")
+    load_elements(driver)
+    with metrics.stage("payload") as span:
+        if mode == "browser":
+            payload = driver.execute_script(DOM_EXTRACT_SCRIPT, scope, links is not None)  #Walk the live DOM in Chrome, only the rows cross the wire
+        else:
+            payload = driver.page_source
+        span.add(bytes=len(payload))
+    if archive:
+        source = payload if mode != "browser" else driver.page_source
+        archive_html(strip_scripts(source), file_index)                         #Same script-free HTML whichever mode rendered it
+    if visual is not None:
+        visual.check(driver, url)                                               #Tile hashes of the settled page, for layout and image changes
+    return payload, driver.current_url
+
+
+def extract_payload(payload, mode="browser", scope=None, links=None, base_url=None):  #CPU half, safe to run in a worker process
+    if mode == "browser":
+        with metrics.stage("extract", bytes=len(payload)) as span:
+            data_dict = rows_from_payload(payload, links)
+            span.add(rows=len(data_dict['Tag']))
+        return data_dict
+
+    with metrics.stage("strip_scripts"):
+        cleaned_source = strip_scripts(payload)
+    hrefs = [] if links is not None else None
+    with metrics.stage("extract", bytes=len(cleaned_source)) as span:
+        data_dict = scope_rows(extract_rows(cleaned_source, root='body', links=hrefs), scope)
+        span.add(rows=len(data_dict['Tag']))
+    if links is not None:
+        links.extend(urljoin(base_url, href) for href in hrefs)                 #Absolute, as the browser mode gives them
+    return data_dict
+
+
+def render_url(driver, url, file_index, archive=False, mode="browser", scope=None, visual=None, links=None):
+    payload, final_url = render_page(driver, url, file_index, archive=archive, mode=mode, scope=scope, visual=visual,
+                                     links=links)
+    return extract_payload(payload, mode, scope, links, final_url)
+
+
+def render_with_driver(url, file_index, pool=None, archive=False, mode="browser", scope=None, visual=None, links=None):
+    if pool is not None:
+        with pool.driver() as driver:
+            data_dict = render_url(driver, url, file_index, archive=archive, mode=mode, scope=scope, visual=visual,
+                                   links=links)
+    else:
+        print(f"Opening WebDriver for URL: {url}")
+        with new_driver() as driver:
+            print(f"WebDriver started for URL: {url}")
+            data_dict = render_url(driver, url, file_index, archive=archive, mode=mode, scope=scope, visual=visual,
+                                   links=links)
+    return normalise_rows(noise_rules, data_dict, url)                          #Mask volatile values before anything is stored or diffed
+
+
+def fetch_static_source(url):                                                   #Plain keep-alive GET, no browser: (final URL, HTML)
+    with metrics.stage("http_get") as span:
+        response = http_client.get(url)
+        span.add(bytes=len(response.body))
+    if response.status >= 400:                                                  #Never extract an error page as content
+        raise OSError(f"HTTP {response.status} for {url}")
+    return response.url, response.text()
+
+
+def fetch_static_rows(url, scope=None, links=None):
+    final_url, source = fetch_static_source(url)
+    data_dict = extract_payload(source, "source", scope, links, final_url)      #Links relative to where any redirects ended
+    return normalise_rows(noise_rules, data_dict, url)
+
+
+def load_rows(url, file_index, pool=None, archive=False, mode="browser", scope=None, visual=None, links=None):
+    use_static, render_mode = plan_fetch(url, mode)
+    if render_mode is None:
+        if mode == "auto":
+            print(f"Using static HTML for URL: {url}")
+        return fetch_static_rows(url, scope, links)
+    static_rows = fetch_static_rows(url, scope) if use_static else None
+    data_dict = render_with_driver(url, file_index, pool=pool, archive=archive, mode=render_mode, scope=scope,
+                                   visual=visual, links=links)
+    if static_rows is not None:                                                 #Exactly the rows a static fetch would serve
+        render_classifier.record(url, static_rows, data_dict)
+    return data_dict
+
+
+def fetch_rows(url, file_index, pool=None, save=True, csv_export=True, archive=False, mode="browser", store=None,
+               scope=None, cache=None, visual=None, links=None):
+    scope = scope if scope is not None else url_scopes.get(url)                 #Only the scoped subtrees are extracted and diffed
+    try:
+        with metrics.bind_url(url):                                             #Stages below are reported per URL
+            key = cache_key(url, mode, scope)
+            data_dict = cache.get(key) if cache is not None and links is None else None  #A crawl needs the page's links too
+            if data_dict is not None:
+                print(f"Using cached rows for URL: {url}")
+            else:
+                data_dict = load_rows(url, file_index, pool=pool, archive=archive, mode=mode, scope=scope, visual=visual,
+                                      links=links)
+                if cache is not None:
+                    cache.put(key, data_dict)
+
+            if store is not None:
+                store.put(url, data_dict)                                       #Keep history as a delta against earlier versions
+            snapshot_path = save_snapshot(data_dict, file_index) if save else None
+            csv_path = save_csv(data_dict, file_index) if save and csv_export else None
+            return data_dict, snapshot_path, csv_path
+    except Exception as e:
+        logging.error(f"Error in fetch_rows function for URL {url}: {e}")
+        return None, None, None
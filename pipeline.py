@@ -0,0 +1,305 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+import metrics
+from driver_pool import DriverPool
+from normalise import normalise_rows
+from tree_diff import diff_trees
+from render_cache import cache_key, dedupe
+from page_fetch import (MODES, csv_rows, duplicate_result, extract_payload, fetch_static_source, new_driver,
+                        noise_rules, plan_fetch, render_classifier, render_page, save_csv, save_snapshot, url_scopes)
+
+_DONE = object()
+
+
+class StageStats:
+    """Busy time and in-flight count of one pipeline stage, shared by its worker threads."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.busy_time = 0.0
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def finish(self, started, failed=False):
+        with self._lock:
+            self.in_flight -= 1
+            self.items += 1
+            self.errors += failed
+            self.busy_time += time.perf_counter() - started
+
+    def snapshot(self, elapsed):
+        with self._lock:
+            capacity = self.workers * elapsed
+            return {
+                "workers": self.workers,
+                "items": self.items,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "busy_time": round(self.busy_time, 3),
+                "occupancy": round(self.busy_time / capacity, 3) if capacity else 0.0,
+            }
+
+
+def extract_page(url, job, file_index, save=True, csv_export=True, collect_metrics=False, scope=None,
+                 want_links=False):                                             #Runs in a worker process
+    """Rows, static rows (auto mode's check), links, snapshot and CSV paths for one rendered page."""
+    metrics.enable(collect_metrics)
+    links = [] if want_links else None
+    static_rows = None
+    with metrics.bind_url(url):
+        data_dict = normalise_rows(noise_rules, extract_payload(job["payload"], job["mode"], scope, links,
+                                                                job["base_url"]), url)
+        if job.get("static") is not None:
+            static_url, source = job["static"]
+            static_rows = normalise_rows(noise_rules, extract_payload(source, "source", scope, None, static_url), url)
+        snapshot_path = save_snapshot(data_dict, file_index) if save else None
+        csv_path = save_csv(data_dict, file_index) if save and csv_export else None
+    return data_dict, static_rows, links, snapshot_path, csv_path, metrics.take()
+
+
+def diff_pages(rows1, rows2, collect_metrics=False):                            #Runs in a worker process
+    metrics.enable(collect_metrics)
+    with metrics.stage("diff", rows=len(rows1['Tag']) + len(rows2['Tag'])):
+        ops = diff_trees(csv_rows(rows1), csv_rows(rows2))
+    return ops, metrics.take()
+
+
+class Pipeline:
+    """Render -> extract -> diff, with the CPU-bound stages moved out of the browser threads.
+
+    Browser threads only load the page, wait for it to settle and pull out a payload with
+    page_fetch.render_page (the DOM_EXTRACT_SCRIPT JSON in "browser" mode, page_source in
+    "source" mode); "static" pages, and "auto" pages the classifier lets skip Chrome, are
+    a plain GET on the same threads. Payloads go through
+    a bounded queue to feeder threads, each of which keeps one job running in the process
+    pool, so parsing, hashing, snapshot writes and diffs run on all cores. When extraction
+    falls behind the queue fills up and the browsers wait instead of buffering pages.
+    """
+
+    def __init__(self, render_workers=2, extract_workers=None, queue_size=None, mode="browser", max_pages=50,
+                 save=True, csv_export=True, store=None, report_every=None, scopes=None, cache=None,
+                 visual=None, archive=False, links=False):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+        self.render_workers = render_workers
+        self.extract_workers = extract_workers or os.cpu_count() or 1
+        self.queue_size = queue_size or self.extract_workers * 2
+        self.mode = mode
+        self.max_pages = max_pages
+        self.save = save
+        self.csv_export = csv_export
+        self.store = store
+        self.report_every = report_every
+        self.scopes = url_scopes if scopes is None else scopes
+        self.cache = cache
+        self.visual = visual
+        self.archive = archive
+        self.links = links                                                      #Give every result the page's absolute links
+        self.render_stage = StageStats("render", render_workers)
+        self.extract_stage = StageStats("extract", self.extract_workers)
+        self.diff_stage = StageStats("diff", self.extract_workers)
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._diffs = {}
+        self._copies = {}
+        self._depth_samples = 0
+        self._depth_total = 0
+        self._depth_max = 0
+        self._lock = threading.Lock()
+        self._started = None
+
+    def _sample_depth(self):
+        depth = self._queue.qsize()
+        with self._lock:
+            self._depth_samples += 1
+            self._depth_total += depth
+            self._depth_max = max(self._depth_max, depth)
+
+    def _render(self, pool, url, file_index):
+        scope = self.scopes.get(url)
+        if self.cache is not None and not self.links:                           #A crawl needs the page's links too
+            rows = self.cache.get(cache_key(url, self.mode, scope))
+            if rows is not None:
+                print(f"Using cached rows for URL: {url}")
+                self._queue.put((url, file_index, None, rows))
+                self._sample_depth()
+                return
+        started = self.render_stage.start()
+        job = None
+        try:
+            with metrics.bind_url(url):
+                use_static, render_mode = plan_fetch(url, self.mode)
+                static = fetch_static_source(url) if use_static else None
+                if render_mode is None:
+                    if self.mode == "auto":
+                        print(f"Using static HTML for URL: {url}")
+                    job = {"mode": "source", "payload": static[1], "base_url": static[0]}
+                else:
+                    with pool.driver() as driver:
+                        payload, final_url = render_page(driver, url, file_index, archive=self.archive,
+                                                         mode=render_mode, scope=scope, visual=self.visual,
+                                                         links=[] if self.links else None)
+                    job = {"mode": render_mode, "payload": payload, "base_url": final_url, "static": static}
+        except Exception as e:
+            logging.error(f"Error while rendering URL {url}: {e}")
+        finally:
+            self.render_stage.finish(started, failed=job is None)
+        self._queue.put((url, file_index, job, None))                           #Blocks while extraction is behind
+        self._sample_depth()
+
+    def _feed(self, executor, results, pairs):
+        while True:
+            item = self._queue.get()
+            self._sample_depth()
+            if item is _DONE:
+                return
+            url, file_index, job, rows = item
+            result = {"url": url, "index": file_index, "rows": rows, "snapshot_path": None, "csv_path": None,
+                      "regions": self.visual.take(url) if self.visual is not None else None}
+            if rows is not None:                                                #Cache hit: only the outputs are left to write
+                result["snapshot_path"] = save_snapshot(rows, file_index) if self.save else None
+                result["csv_path"] = save_csv(rows, file_index) if self.save and self.csv_export else None
+                if self.store is not None:
+                    self.store.put(url, rows)
+            elif job is not None:
+                started = self.extract_stage.start()
+                failed = True
+                try:
+                    result["rows"], static_rows, links, result["snapshot_path"], result["csv_path"], spans = \
+                        executor.submit(extract_page, url, job, file_index, self.save, self.csv_export,
+                                        metrics.enabled(), self.scopes.get(url), self.links).result()
+                    metrics.merge(spans)
+                    if static_rows is not None:                                 #Exactly the rows a static fetch would serve
+                        render_classifier.record(url, static_rows, result["rows"])
+                    if self.links:
+                        result["links"] = links
+                    if self.cache is not None:
+                        self.cache.put(cache_key(url, self.mode, self.scopes.get(url)), result["rows"])
+                    if self.store is not None:
+                        self.store.put(url, result["rows"])
+                    failed = False
+                except Exception as e:
+                    logging.error(f"Error while extracting rows for URL {url}: {e}")
+                finally:
+                    self.extract_stage.finish(started, failed=failed)
+
+            copies = {i: duplicate_result(result, i) for i in self._copies.get(file_index, ())}
+            with self._lock:
+                results[file_index] = result
+                results.update(copies)
+                done = {file_index, *copies}
+                ready = [pair for pair in pairs if done.intersection(pair) and all(i in results for i in pair)]
+            for pair in ready:
+                self._diff(executor, results, pair)
+
+    def _diff(self, executor, results, pair):
+        rows1, rows2 = results[pair[0]]["rows"], results[pair[1]]["rows"]
+        if rows1 is None or rows2 is None:
+            return
+        if rows1 is rows2 or rows1.root_hash == rows2.root_hash:                #Same page, nothing to diff
+            with self._lock:
+                self._diffs[pair] = []
+            return
+        started = self.diff_stage.start()
+        failed = True
+        try:
+            ops, spans = executor.submit(diff_pages, rows1, rows2, metrics.enabled()).result()
+            metrics.merge(spans)
+            with self._lock:
+                self._diffs[pair] = ops
+            failed = False
+        except Exception as e:
+            logging.error(f"Error while diffing pages {pair}: {e}")
+        finally:
+            self.diff_stage.finish(started, failed=failed)
+
+    def _report(self, stop):
+        while not stop.wait(self.report_every):
+            stats = self.stats()
+            logging.info(f"Queue depth {stats['queue']['depth']}/{self.queue_size}, "
+                         f"rendering {stats['render']['in_flight']}/{self.render_workers}, "
+                         f"extracting {stats['extract']['in_flight'] + stats['diff']['in_flight']}/{self.extract_workers}")
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        with self._lock:
+            depth = {
+                "depth": self._queue.qsize(),
+                "size": self.queue_size,
+                "max_depth": self._depth_max,
+                "mean_depth": round(self._depth_total / self._depth_samples, 2) if self._depth_samples else 0.0,
+            }
+        return {
+            "elapsed": round(elapsed, 3),
+            "queue": depth,
+            "render": self.render_stage.snapshot(elapsed),
+            "extract": self.extract_stage.snapshot(elapsed),
+            "diff": self.diff_stage.snapshot(elapsed),
+        }
+
+    def run(self, urls, pairs=()):
+        """Returns (results in URL order, {pair: diff ops}, stats). pairs are (index, index) into urls."""
+        results = {}
+        self._diffs = {}
+        pairs = [tuple(pair) for pair in pairs]
+        firsts, owners = dedupe(urls)                                           #Each distinct URL is rendered once
+        self._copies = {}
+        for file_index, first in owners.items():
+            self._copies.setdefault(first, []).append(file_index)
+        render_workers = max(1, min(self.render_workers, len(firsts)))
+        stop = threading.Event()
+
+        # Spawned workers import cleanly even though browser threads are already running.
+        with ProcessPoolExecutor(max_workers=self.extract_workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            warm = [executor.submit(os.getpid) for _ in range(self.extract_workers)]  #Start the interpreters alongside Chrome
+            if self.mode == "static":                                           #Plain GETs only, never start Chrome
+                pool_context = nullcontext()
+            else:
+                print(f"Starting driver pool with {render_workers} workers...")
+                pool_context = DriverPool(new_driver, size=render_workers, max_pages=self.max_pages,
+                                          warm=self.mode != "auto")             #Auto mode may not render at all
+            with pool_context as pool:
+                for future in warm:
+                    future.result()
+                self._started = time.perf_counter()
+                feeders = [threading.Thread(target=self._feed, args=(executor, results, pairs), daemon=True)
+                           for _ in range(self.extract_workers)]
+                for feeder in feeders:
+                    feeder.start()
+                if self.report_every:
+                    threading.Thread(target=self._report, args=(stop,), daemon=True).start()
+
+                with ThreadPoolExecutor(max_workers=render_workers) as browsers:
+                    for future in [browsers.submit(self._render, pool, urls[i], i) for i in firsts]:
+                        future.result()
+                for _ in feeders:
+                    self._queue.put(_DONE)
+                for feeder in feeders:
+                    feeder.join()
+                stop.set()
+                pool_stats = pool.stats() if pool is not None else None
+
+        stats = self.stats()
+        stats["pool"] = pool_stats
+        stats["deduplicated"] = len(owners)
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        logging.info(f"Pipeline done in {stats['elapsed']}s: render occupancy {stats['render']['occupancy']:.1%}, "
+                     f"extract occupancy {stats['extract']['occupancy']:.1%}, "
+                     f"queue depth max {stats['queue']['max_depth']}/{self.queue_size} "
+                     f"(mean {stats['queue']['mean_depth']})")
+        return [results[i] for i in range(len(urls))], self._diffs, stats
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+import metrics
+from snapshot import load_snapshot, write_snapshot
+
+
+def cache_key(url, mode="browser", scope=None):                                 #Scope and mode change the rows, so they are part of the key
+    return f"{mode} {url} {json.dumps(scope, sort_keys=True) if scope else ''}"
+
+
+def dedupe(urls):
+    """Returns (indices of first occurrences, {duplicate index: first index}) for a batch of URLs."""
+    first = {}
+    owners = {}
+    for i, url in enumerate(urls):
+        if url in first:
+            owners[i] = first[url]
+        else:
+            first[url] = i
+    return list(first.values()), owners
+
+
+class RenderCache:
+    """Extracted rows of recently rendered pages, so a repeated URL skips the browser.
+
+    The memory tier is an LRU bounded by entry count and total rows; entries older than
+    `ttl` seconds are treated as missing. With `directory` set, every page is also written
+    as a snapshot file there, which outlives the process and is promoted back into memory
+    on a hit; the disk tier drops its oldest files beyond `max_disk_bytes`.
+    """
+
+    def __init__(self, ttl=300, max_entries=64, max_rows=2_000_000, directory=None, max_disk_bytes=512 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()                                           #key -> (stored_at, data_dict)
+        self._rows = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest() + ".snap")
+
+    def _fresh(self, stored_at):
+        return self.ttl is None or time.time() - stored_at < self.ttl
+
+    def _remember(self, key, stored_at, data_dict):                             #Caller holds the lock
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._rows -= len(previous[1]['Tag'])
+        self._entries[key] = (stored_at, data_dict)
+        self._rows += len(data_dict['Tag'])
+        while self._entries and (len(self._entries) > self.max_entries or self._rows > self.max_rows):
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._rows -= len(evicted['Tag'])
+            self.evictions += 1
+
+    def _load_disk(self, key):
+        path = self._path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if not self._fresh(stored_at):
+                os.remove(path)
+                return None, None
+            with load_snapshot(path) as snapshot:
+                return stored_at, snapshot.to_table()
+        except (OSError, ValueError):
+            return None, None
+
+    def get(self, key):
+        with metrics.stage("render_cache") as span:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and not self._fresh(entry[0]):
+                    self._rows -= len(self._entries.pop(key)[1]['Tag'])
+                    self.expired += 1
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    span.add(hits=1)
+                    return entry[1]
+            if self.directory:
+                stored_at, data_dict = self._load_disk(key)
+                if data_dict is not None:
+                    with self._lock:
+                        self._remember(key, stored_at, data_dict)
+                        self.disk_hits += 1
+                    span.add(disk_hits=1)
+                    return data_dict
+            with self._lock:
+                self.misses += 1
+            span.add(misses=1)
+            return None
+
+    def put(self, key, data_dict):
+        if data_dict is None:
+            return
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, stored_at, data_dict)
+        if self.directory:
+            try:
+                write_snapshot(data_dict, self._path(key))
+                self._prune_disk()
+            except OSError as e:                                                #The memory tier still has the page
+                logging.warning(f"Could not write render cache entry to {self.directory}: {e}")
+
+    def _prune_disk(self):                                                      #Oldest snapshots go first
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".snap"):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+                except OSError:
+                    continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "rows": self._rows,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+from merkle import root_hash
+
+
+class RenderClassifier:
+    """Learns per URL whether a plain HTTP GET gives the same rows as a Chrome render.
+
+    A URL is treated as static once `min_agreements` renders in a row matched its static
+    fetch, by root hash or, with `count_tolerance`, by element count. Static URLs are still
+    rendered every `verify_every` fetches so a page that starts needing JS is caught, and
+    URLs that needed JS get re-tried the same way in case they stopped. The static side must
+    be the rows a static fetch actually serves, so a URL is only classified static when
+    switching between the two paths cannot show up as a diff; pages whose markup html.parser
+    and Chrome build differently (implied <tbody>, <p> closed by a <div>) stay rendered.
+    """
+
+    def __init__(self, path=None, min_agreements=2, verify_every=20, count_tolerance=0.0):
+        self.path = path
+        self.min_agreements = min_agreements
+        self.verify_every = verify_every
+        self.count_tolerance = count_tolerance
+        self._lock = threading.Lock()
+        self._state = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._state = json.load(f)
+
+    def _entry(self, url):
+        return self._state.setdefault(url, {"static": False, "agreements": 0, "since_verify": 0, "renders": 0})
+
+    def plan(self, url):
+        """Returns (fetch static, render) for the next fetch of url."""
+        with self._lock:
+            entry = self._entry(url)
+            entry["since_verify"] += 1
+            due = entry["since_verify"] >= self.verify_every
+            if due:
+                entry["since_verify"] = 0
+            if entry["static"]:
+                return True, due
+            if entry["agreements"] == 0 and entry["renders"] > 0:
+                return due, True                                                #Known to need JS: only re-check now and then
+            return True, True
+
+    def _agree(self, static_rows, rendered_rows):
+        if root_hash(static_rows) == root_hash(rendered_rows):
+            return True
+        if self.count_tolerance:
+            static_count, rendered_count = len(static_rows['Tag']), len(rendered_rows['Tag'])
+            return abs(static_count - rendered_count) <= self.count_tolerance * max(rendered_count, 1)
+        return False
+
+    def record(self, url, static_rows, rendered_rows):
+        agree = self._agree(static_rows, rendered_rows)
+        with self._lock:
+            entry = self._entry(url)
+            entry["renders"] += 1
+            if agree:
+                entry["agreements"] += 1
+                entry["static"] = entry["agreements"] >= self.min_agreements
+            else:
+                entry["agreements"] = 0
+                entry["static"] = False
+            self._save()
+        return agree
+
+    def is_static(self, url):
+        with self._lock:
+            return self._state.get(url, {}).get("static", False)
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,83 @@
+import json
+import os
+import re
+import numpy as np
+from node_table import NodeTable
+from tree_diff import _structure
+
+# tag, .class and #id in any combination, e.g. "table.pricing", "#listing", "div.card.sale".
+_SIMPLE_SELECTOR = re.compile(r'^(?P<tag>[A-Za-z][\w-]*|\*)?(?P<rest>(?:[.#][\w-]+)*)$')
+
+
+def load_scopes(path="scopes.json"):
+    """Per-URL scopes: {url: {"include": [selectors], "exclude": [selectors]}}."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _compile(selector):
+    match = _SIMPLE_SELECTOR.match(selector.strip())
+    if not match or not selector.strip():
+        raise ValueError(f"Selector {selector!r} needs the in-browser extractor (mode='browser')")
+    tag = match.group('tag') if match.group('tag') not in (None, '*') else None
+    classes = set(re.findall(r'\.([\w-]+)', match.group('rest')))
+    ids = re.findall(r'#([\w-]+)', match.group('rest'))
+    return (tag.lower() if tag else None), (ids[0] if ids else None), classes
+
+
+def select_rows(data_dict, selectors):                                          #Rows matching any of the simple selectors
+    rows = set()
+    for tag, id_, classes in map(_compile, selectors):
+        rows.update(i for i, (row_tag, row_id, row_classes) in enumerate(zip(data_dict['Tag'], data_dict['ID'],
+                                                                              data_dict['Class']))
+                    if (tag is None or row_tag == tag) and (id_ is None or row_id == id_)
+                    and (not classes or classes.issubset(row_classes or ())))
+    return sorted(rows)
+
+
+def subtree_mask(depths, roots):
+    """Boolean mask of every row inside the subtrees rooted at `roots`."""
+    n = len(depths)
+    _, end = _structure(np.asarray(depths, dtype=np.int64))
+    cover = np.zeros(n + 1, dtype=np.int64)                                     #Difference array over row ranges
+    for i in roots:
+        cover[i] += 1
+        cover[end[i]] -= 1
+    return np.cumsum(cover[:n]) > 0
+
+
+def take_rows(data_dict, rows, depths=None):                                    #New table of the given rows, rehashed
+    result = {}
+    for column, values in data_dict.items():
+        if column != 'Hash':
+            values = list(values)                                               #Whole-column decode, then pick
+            result[column] = [values[i] for i in rows]
+    if depths is not None:
+        result['Depth'] = depths
+    return NodeTable.from_data_dict(result)
+
+
+def scope_rows(data_dict, scope):
+    """Applies an include/exclude scope to already extracted rows.
+
+    The browser extractor applies scopes before serialising; this is the same cut for
+    rows that came from page_source or a plain HTTP fetch, limited to simple selectors
+    (tag, .class, #id). Included subtrees are re-rooted at depth 0, excluded ones dropped.
+    """
+    if not scope or not (scope.get('include') or scope.get('exclude')):
+        return data_dict
+    depths = np.asarray(data_dict['Depth'], dtype=np.int64)
+    root_depth = np.zeros(len(depths), dtype=np.int64)
+    if scope.get('include'):
+        roots = select_rows(data_dict, scope['include'])
+        keep = subtree_mask(depths, roots)
+        _, end = _structure(depths)
+        for i in reversed(roots):                                               #Outer roots last, so they win
+            root_depth[i:end[i]] = depths[i]
+    else:
+        keep = np.ones(len(depths), dtype=bool)
+    keep &= ~subtree_mask(depths, select_rows(data_dict, scope.get('exclude') or ()))
+    kept = np.flatnonzero(keep)
+    return take_rows(data_dict, kept, (depths[kept] - root_depth[kept]).tolist())
@@ -0,0 +1,114 @@
+import logging
+
+# Runs inside the page. Scrolls one viewport at a time so lazy content is triggered, and
+# resolves once the DOM, in-flight fetch/XHR requests and lazily loaded images have all
+# been quiet for `quietMs`. Gives up after `timeoutMs` and reports that it did not settle.
+# `waitImages` is false in lean renders, where image bytes are blocked and never arrive.
+SETTLE_SCRIPT = """
+var quietMs = arguments[0], timeoutMs = arguments[1], waitImages = arguments[2];
+var done = arguments[arguments.length - 1];
+var start = performance.now(), last = start, pending = 0, mutations = 0, lazyLoads = 0;
+var finished = false, tracked = new WeakSet();
+
+function touch() { last = performance.now(); }
+function begin() { pending++; touch(); }
+function end() { pending = Math.max(0, pending - 1); touch(); }
+
+var mutationObserver = new MutationObserver(function (records) {
+    mutations += records.length;
+    touch();
+    for (var i = 0; i < records.length; i++) {
+        var added = records[i].addedNodes;
+        for (var j = 0; j < added.length; j++) {
+            if (waitImages && added[j].nodeType === 1) { watchImages(added[j]); }
+        }
+    }
+});
+mutationObserver.observe(document.documentElement,
+    {childList: true, subtree: true, attributes: true, characterData: true});
+
+var performanceObserver = null;
+if (window.PerformanceObserver) {
+    performanceObserver = new PerformanceObserver(touch);
+    try { performanceObserver.observe({type: 'resource', buffered: false}); } catch (e) {}
+}
+
+var originalFetch = window.fetch;
+if (originalFetch) {
+    window.fetch = function () {
+        begin();
+        return originalFetch.apply(this, arguments).finally(end);
+    };
+}
+var originalSend = XMLHttpRequest.prototype.send;
+XMLHttpRequest.prototype.send = function () {
+    begin();
+    this.addEventListener('loadend', end, {once: true});
+    return originalSend.apply(this, arguments);
+};
+
+var intersectionObserver = new IntersectionObserver(function (entries) {
+    entries.forEach(function (entry) {
+        var img = entry.target;
+        if (!entry.isIntersecting) { return; }
+        intersectionObserver.unobserve(img);
+        if (img.complete) { return; }
+        lazyLoads++;
+        begin();
+        img.addEventListener('load', end, {once: true});
+        img.addEventListener('error', end, {once: true});
+    });
+});
+function watchImages(root) {
+    var images = root.tagName === 'IMG' ? [root] : root.getElementsByTagName('img');
+    for (var i = 0; i < images.length; i++) {
+        if (!tracked.has(images[i])) {
+            tracked.add(images[i]);
+            intersectionObserver.observe(images[i]);
+        }
+    }
+}
+if (waitImages) { watchImages(document.documentElement); }
+
+function finish(settled) {
+    if (finished) { return; }
+    finished = true;
+    clearInterval(timer);
+    mutationObserver.disconnect();
+    intersectionObserver.disconnect();
+    if (performanceObserver) { performanceObserver.disconnect(); }
+    if (originalFetch) { window.fetch = originalFetch; }
+    XMLHttpRequest.prototype.send = originalSend;
+    // Cross-origin entries without Timing-Allow-Origin report 0, so this is a lower bound.
+    var transferred = 0;
+    performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'))
+        .forEach(function (entry) { transferred += entry.transferSize || 0; });
+    done({settled: settled, elapsed_ms: Math.round(performance.now() - start),
+          mutations: mutations, lazy_loads: lazyLoads, pending: pending, transferred_bytes: transferred});
+}
+
+var timer = setInterval(function () {
+    var now = performance.now();
+    var height = document.body ? document.body.scrollHeight : 0;
+    var bottom = window.innerHeight + window.scrollY >= height - 2;
+    if (!bottom) {
+        window.scrollBy(0, window.innerHeight);
+        touch();
+    } else if (pending === 0 && document.readyState === 'complete' && now - last >= quietMs) {
+        finish(true);
+        return;
+    }
+    if (now - start >= timeoutMs) { finish(false); }
+}, 50);
+"""
+
+
+def wait_for_settle(driver, quiet_ms=500, timeout=15, images=None):
+    if images is None:                                                          #A lean driver never receives image bytes
+        blocklist = getattr(driver, "blocklist", None)
+        images = blocklist is None or not blocklist.blocks_images
+    driver.set_script_timeout(timeout + 5)
+    result = driver.execute_async_script(SETTLE_SCRIPT, quiet_ms, int(timeout * 1000), images)
+    if not result.get("settled"):
+        logging.warning(f"Page did not settle within {timeout}s ({result.get('pending')} requests still pending)")
+    return result
@@ -0,0 +1,83 @@
+import json
+import mmap
+import os
+import numpy as np
+from node_table import NodeTable
+
+# Snapshot file layout: 8-byte magic, little-endian uint64 header length, JSON header,
+# then each column as a raw little-endian array aligned to 8 bytes. The header holds the
+# tag/class dictionaries and the offset, dtype and length of every column.
+MAGIC = b"SNAP1\0\0\0"
+ALIGN = 8
+
+
+def _pad(n):
+    return (-n) % ALIGN
+
+
+def write_snapshot(data_dict, path):
+    table = NodeTable.from_data_dict(data_dict)                                 #Already in file layout when it is a NodeTable
+    columns = table.columns
+    dictionaries = {"tags": table.tag_names, "classes": table.class_names, "root_hash": table.root_hash}
+    layout = {}
+    offset = 0
+    for name, array in columns.items():
+        layout[name] = {"dtype": array.dtype.str, "offset": offset, "length": len(array)}
+        offset += array.nbytes + _pad(array.nbytes)
+
+    header = json.dumps({"rows": len(columns["tag"]), "columns": layout, **dictionaries}).encode("utf-8")
+    header += b" " * _pad(len(MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header)).astype("<u8").tobytes())
+        f.write(header)
+        for array in columns.values():
+            f.write(array.tobytes())
+            f.write(b"\0" * _pad(array.nbytes))
+    os.replace(tmp_path, path)                                                  #Readers never see a half-written snapshot
+    return path
+
+
+class Snapshot(NodeTable):
+    """Read-only, memory-mapped NodeTable over a snapshot file. Columns are NumPy views on the map."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        header_length = int(np.frombuffer(self._mmap, dtype="<u8", count=1, offset=len(MAGIC))[0])
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(bytes(self._mmap[header_start:header_start + header_length]))
+        columns = {}
+        data_start = header_start + header_length
+        for name, spec in self.header["columns"].items():
+            columns[name] = np.frombuffer(self._mmap, dtype=spec["dtype"], count=spec["length"],
+                                          offset=data_start + spec["offset"])
+        super().__init__(columns, self.header["tags"], self.header["classes"], self.header["root_hash"])
+
+    def __len__(self):
+        return self.header["rows"]
+
+    def to_table(self):                                                         #In-memory copy that outlives close()
+        return self.copy()
+
+    def close(self):
+        self.columns = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass                                                                #A caller still holds column views; the map goes when they do
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_snapshot(path):
+    return Snapshot(path)
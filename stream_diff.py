@@ -0,0 +1,168 @@
+import csv
+import heapq
+import os
+import shutil
+import tempfile
+from collections import deque
+from itertools import islice
+from snapshot import load_snapshot
+
+KEY_COLUMNS = ("Tag", "ID")
+IGNORED_COLUMNS = ("Hash",)                                                     #Subtree hashes change with any descendant
+
+
+def _read_table(path):
+    """Yields the header, then every row as a list of strings, from a CSV export or a .snap snapshot.
+
+    Snapshot rows are decoded one at a time from the memory map, in the same text form the
+    CSV export uses, so neither kind of file is ever loaded whole.
+    """
+    if path.endswith(".snap"):
+        snapshot = load_snapshot(path)
+        try:
+            header = list(snapshot.keys())
+            yield header
+            for i in range(len(snapshot)):
+                yield [snapshot.csv_value(column, i) for column in header]
+        finally:
+            snapshot.close()
+        return
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        yield next(reader, [])
+        for row in reader:
+            yield row
+
+
+def _sort_runs(rows, header, key_positions, value_positions, run_rows, tmp_dir):
+    """Splits rows into sorted run files of at most run_rows rows. Returns the run paths."""
+    runs = []
+    index = 0
+    while True:
+        chunk = list(islice(rows, run_rows))
+        if not chunk:
+            break
+        records = []
+        for row in chunk:
+            row += [""] * (len(header) - len(row))
+            records.append([row[i] for i in key_positions] + [row[i] for i in value_positions] + [index] + row)
+            index += 1
+        records.sort()
+        runs.append(_write_run(records, tmp_dir, len(runs)))
+    return runs
+
+
+def _write_run(records, tmp_dir, number):
+    run_path = os.path.join(tmp_dir, f"run-{number:06d}.csv")
+    with open(run_path, "w", encoding="utf-8", newline="") as out:
+        csv.writer(out).writerows(records)
+    return run_path
+
+
+def _read_run(run_path, width):
+    with open(run_path, "r", encoding="utf-8", newline="") as f:
+        for record in csv.reader(f):
+            record[width] = int(record[width])
+            yield record
+
+
+def _merge_runs(runs, width, fan_in, tmp_dir):
+    """Merges runs fan_in at a time until at most fan_in are left, so open files stay bounded."""
+    number = len(runs)
+    while len(runs) > fan_in:
+        merged = []
+        for start in range(0, len(runs), fan_in):
+            group = runs[start:start + fan_in]
+            merged.append(_write_run(heapq.merge(*(_read_run(run, width) for run in group)), tmp_dir, number))
+            number += 1
+            for run in group:
+                os.remove(run)
+        runs = merged
+    return runs
+
+
+def sorted_rows(path, key_columns=KEY_COLUMNS, ignored_columns=IGNORED_COLUMNS, run_rows=100_000, tmp_dir=None,
+                fan_in=64):
+    """External sort of a CSV export or .snap snapshot by key, then by the remaining compared columns.
+
+    Yields (key, values, line index, row) with the whole file never held in memory: at most
+    run_rows rows are sorted at a time, and the runs are merged at most fan_in at a time.
+    """
+    rows = _read_table(path)
+    run_dir = tempfile.mkdtemp(prefix="stream-diff-", dir=tmp_dir)
+    try:
+        header = next(rows)
+        keys = [header.index(column) for column in key_columns if column in header] or [0]
+        values = [i for i, column in enumerate(header) if i not in keys and column not in ignored_columns]
+        width = len(keys) + len(values)
+        runs = _merge_runs(_sort_runs(rows, header, keys, values, run_rows, run_dir), width, fan_in, run_dir)
+        for record in heapq.merge(*(_read_run(run, width) for run in runs)):
+            yield (tuple(record[:len(keys)]), tuple(record[len(keys):width]), record[width],
+                   dict(zip(header, record[width + 1:])))
+    finally:
+        rows.close()
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def _changes(old, new, ignored_columns):
+    changes = {}
+    for field in new:
+        if field not in ignored_columns and old.get(field, "") != new.get(field, ""):
+            changes[field] = {"Old": old.get(field, ""), "New": new.get(field, "")}
+    return changes
+
+
+def stream_diff(path1, path2, key_columns=KEY_COLUMNS, ignored_columns=IGNORED_COLUMNS, run_rows=100_000,
+                window=1000, tmp_dir=None, fan_in=64):
+    """Diffs two CSV exports or .snap snapshots in bounded memory, yielding change events as it goes.
+
+    Both files are externally sorted on (key, compared columns) and walked once in step.
+    Equal rows cancel out. Unmatched rows that share a key are paired up as updates, but
+    only within a window of `window` rows per side, which is what keeps memory bounded
+    even when one key (e.g. every div without an ID) covers most of the page.
+
+    Events use the same shape as tree_diff ops: {"op": "insert"/"delete", "index", "tag",
+    "row"} and {"op": "update", "index", "tag", "old", "new", "changes"}; index is the
+    data row number in the file the row came from.
+    """
+    old_rows = sorted_rows(path1, key_columns, ignored_columns, run_rows, tmp_dir, fan_in)
+    new_rows = sorted_rows(path2, key_columns, ignored_columns, run_rows, tmp_dir, fan_in)
+    deleted = deque()
+    inserted = deque()
+    current = None
+
+    def flush(limit=0):
+        while len(deleted) > limit or len(inserted) > limit:
+            if deleted and inserted:
+                (_, _, _, old), (_, _, index, new) = deleted.popleft(), inserted.popleft()
+                yield {"op": "update", "index": index, "tag": new.get("Tag"), "old": old, "new": new,
+                       "changes": _changes(old, new, ignored_columns)}
+            elif deleted:
+                _, _, index, row = deleted.popleft()
+                yield {"op": "delete", "index": index, "tag": row.get("Tag"), "row": row}
+            else:
+                _, _, index, row = inserted.popleft()
+                yield {"op": "insert", "index": index, "tag": row.get("Tag"), "row": row}
+
+    try:
+        old, new = next(old_rows, None), next(new_rows, None)
+        while old is not None or new is not None:
+            if new is None or (old is not None and old[:2] < new[:2]):
+                side, record = deleted, old
+                old = next(old_rows, None)
+            elif old is None or new[:2] < old[:2]:
+                side, record = inserted, new
+                new = next(new_rows, None)
+            else:
+                old, new = next(old_rows, None), next(new_rows, None)       #Same key and values: unchanged
+                continue
+            if record[0] != current:
+                yield from flush()
+                current = record[0]
+            side.append(record)
+            yield from flush(window)
+        yield from flush()
+    finally:
+        old_rows.close()
+        new_rows.close()
+
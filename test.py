@@ -1,11 +1,12 @@
 import pandas as pd
 import os
-import time
 import threading
 import json
+import re
 from selenium import webdriver
 from bs4 import BeautifulSoup
-from selenium.webdriver.common.by import By
+from settle import wait_for_settle
+from frame_diff import diff_frames
 
 options = webdriver.ChromeOptions()
 options.add_argument("--disable-logging")
@@ -14,31 +15,9 @@ options.add_argument("--log-level=1")
 options.add_experimental_option("excludeSwitches", ["enable-logging"])
 
 # Load dynamic content
-def load_dynamic_content(driver, max_wait_time=60):
-    def scroll_and_wait():
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        start_time = time.time()
-
-        while time.time() - start_time < max_wait_time:
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)  # Wait for images and ads to load
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                break
-            last_height = new_height
-
-    scroll_and_wait()
-    time.sleep(2)
-    images = driver.find_elements(By.TAG_NAME, "img")
-
-    for img in images:
-        driver.execute_script("arguments[0].scrollIntoView();", img)
-        try:
-            WebDriverWait(driver, 5).until(lambda d: img.get_attribute("complete") == "true")
-        except Exception:
-            print(f"Image did not load: {img.get_attribute('src')}")
-    
-    print("All elements, including dynamic images and ads, should now be fully loaded.")
+def load_dynamic_content(driver, max_wait_time=60, quiet_ms=500):
+    result = wait_for_settle(driver, quiet_ms=quiet_ms, timeout=max_wait_time)
+    print(f"Page settled in {result['elapsed_ms']} ms ({result['lazy_loads']} lazy-loaded images).")
 
 def html(driver, file_index):
     load_dynamic_content(driver)
@@ -87,12 +66,9 @@ def compare_csv_advanced(file1, file2, log_file="change.log", json_file="change.
     df1 = pd.read_csv(file1)
     df2 = pd.read_csv(file2)
 
-    # Identify added/removed rows
-    added = pd.concat([df1, df2]).drop_duplicates(keep=False)
-    removed = pd.concat([df2, df1]).drop_duplicates(keep=False)
-
-    # Compare the DataFrames
-    differences = df1.compare(df2)
+    # Hash-join the rows: added, removed, and modified (paired on Tag/ID)
+    added, removed, differences = diff_frames(df1, df2)
+    differences.columns = ['_'.join(col) for col in differences.columns]
 
     # Log changes to change.log
     with open(log_file, "w", encoding="utf-8") as log:
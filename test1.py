@@ -1,6 +1,7 @@
 import pandas as pd
 import json
 import logging
+from frame_diff import diff_frames
 
 # Setup logging configuration
 logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[logging.StreamHandler()])
@@ -11,16 +12,8 @@ def compare_csv_advanced(file1, file2, log_file="change.log", json_file="change.
     df1 = pd.read_csv(file1)
     df2 = pd.read_csv(file2)
 
-    # Ensure that both DataFrames have the same columns and rows (reindex if needed)
-    df1, df2 = df1.align(df2, axis=1, join='outer')  # Align columns
-    df1, df2 = df1.align(df2, axis=0, join='outer')  # Align rows
-
-    # Identify added and removed rows (based on index)
-    added = pd.concat([df1, df2]).drop_duplicates(keep=False)
-    removed = pd.concat([df2, df1]).drop_duplicates(keep=False)
-
-    # Compare the DataFrames to identify modified values
-    differences = df1.compare(df2)
+    # Hash every row and join on the hashes, so shifted rows are not reported as changes
+    added, removed, differences = diff_frames(df1, df2)
 
     # Flatten multi-level columns for JSON compatibility
     differences.columns = ['_'.join(col) if isinstance(col, tuple) else col for col in differences.columns]
@@ -83,5 +76,6 @@ def compare_csv_advanced(file1, file2, log_file="change.log", json_file="change.
         json.dump(change_data, json_output, indent=4, ensure_ascii=False)
     
     print(f"Comparison complete. Check {log_file} and {json_file} for details.")
-    
-compare_csv_advanced(f"data/test0.csv", f"data/test1.csv", log_file="change.log", json_file="change.json")
\ No newline at end of file
+
+if __name__ == "__main__":
+    compare_csv_advanced(f"data/test0.csv", f"data/test1.csv", log_file="change.log", json_file="change.json")
\ No newline at end of file
@@ -1,49 +1,34 @@
 import csv
 import json
 import logging
+from tree_diff import diff_trees
 
 # Configure logging
 logging.basicConfig(filename='change.log', level=logging.INFO, format='%(asctime)s - %(message)s')
 
 def compare_csv(file1, file2):
-    def read_csv_to_dict(filepath):
-        """Helper function to read a CSV file into a dictionary keyed by the 'Tag' column."""
-        data = {}
+    def read_csv_rows(filepath):
+        """Helper function to read a CSV file into a list of row dictionaries."""
         with open(filepath, 'r', encoding="utf-8") as file:
-            reader = csv.reader(file)
-            for row in reader:
-                tag = row[0]  # Assuming Tag column is at index 0
-                data[tag] = row
-        return data
+            return list(csv.DictReader(file))
 
-    # Read both files into dictionaries keyed by 'Tag'
-    f1_data = read_csv_to_dict(file1)
-    f2_data = read_csv_to_dict(file2)
+    # Read both files in document order
+    f1_rows = read_csv_rows(file1)
+    f2_rows = read_csv_rows(file2)
 
     # Lists to store added, removed, and modified rows
     added_rows = []
     removed_rows = []
     modified_rows = []
 
-    # Check for added and modified rows
-    for tag, row2 in f2_data.items():
-        if tag not in f1_data:
-            added_rows.append(row2)  # Row only in file2 (added)
-        else:
-            row1 = f1_data[tag]
-            # Check if Title, Class, or ID columns have changed
-            title_index, class_index, id_index = 1, 2, 3
-            if (
-                row1[title_index] != row2[title_index] or
-                row1[class_index] != row2[class_index] or
-                row1[id_index] != row2[id_index]
-            ):
-                modified_rows.append((row1, row2))  # Row present in both, but with changes
-
-    # Check for removed rows (present in file1 but not in file2)
-    for tag, row1 in f1_data.items():
-        if tag not in f2_data:
-            removed_rows.append(row1)
+    # Match rows as tree nodes (by unique ID or structural path) instead of by Tag
+    for op in diff_trees(f1_rows, f2_rows):
+        if op["op"] == "insert":
+            added_rows.append(list(op["row"].values()))  # Row only in file2 (added)
+        elif op["op"] == "delete":
+            removed_rows.append(list(op["row"].values()))  # Row only in file1 (removed)
+        elif op["op"] == "update":
+            modified_rows.append((list(op["old"].values()), list(op["new"].values())))  # Same node, with changes
 
     # Log the changes in the change.log file with clear sections and formatting
     logging.info("=====================================================")
@@ -85,6 +70,7 @@ def compare_csv(file1, file2):
         json.dump(changes, json_file, indent=4)
 
 # Example usage
-compare_csv("data/test0.csv", "data/test1.csv")
+if __name__ == "__main__":
+    compare_csv("data/test0.csv", "data/test1.csv")
 
-print("done")
+    print("done")
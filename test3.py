@@ -88,4 +88,5 @@ def compare(file_list, log_file="change.log", json_file="change.json"):
     except Exception as e:
         logging.error(f"Error in compare function: {e}")
 
-compare(["data/test0.csv", "data/test1.csv"])
\ No newline at end of file
+if __name__ == "__main__":
+    compare(["data/test0.csv", "data/test1.csv"])
\ No newline at end of file
@@ -0,0 +1,38 @@
+from benchmark import PageServer, generate_site
+from crawl import Crawler, crawl_site, normalise_url
+from history import SnapshotStore
+
+
+def test_normalise_url():
+    assert normalise_url("HTTP://Example.com:80/a/./b/../c?utm_source=x&b=2&a=1#top") == "http://example.com/a/c?a=1&b=2"
+    assert normalise_url("../page/1", "https://example.com/page/2") == "https://example.com/page/1"
+    assert normalise_url("mailto:team@example.org") is None
+    assert normalise_url("/logo.png", "https://example.com/") is None
+
+
+def test_crawls_and_diffs_a_stand_in_site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = SnapshotStore(str(tmp_path / "history"))
+    changed = []
+    options = dict(max_depth=5, max_pages=50, workers=4, mode="static", store=store, save=False,
+                   on_change=lambda url, ops: changed.append(url))
+    with PageServer(generate_site(12)) as server:
+        pages, stats = crawl_site([server.url("/")], **options)
+        assert len(pages) == stats["pages"] == 12                               #Every page once, despite the spelling variants
+        assert stats["failed"] == 0 and stats["off_site"] > 0
+        assert not changed                                                      #Nothing to diff against yet
+
+        server.update(generate_site(12, seed=1))
+        pages, stats = crawl_site([server.url("/")], **options)
+    store.close()
+    assert len(pages) == 12
+    assert changed and stats["changed"] == len(changed)
+
+
+def test_respects_max_depth_and_max_pages():
+    site = generate_site(40)
+    with PageServer(site) as server:
+        fetch = lambda url, file_index, links: links.extend(["/page/1", "/page/2", "/page/3"]) or [url]
+        pages = Crawler([server.url("/")], fetch, max_depth=1, max_pages=3).run()
+    assert len(pages) == 3
+    assert max(page["depth"] for page in pages) <= 1
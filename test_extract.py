@@ -0,0 +1,40 @@
+import pytest
+from extract import extract_rows, extract_rows_bs4
+
+COLUMNS = ['Tag', 'Title', 'Class', 'ID', 'Depth', 'Hash']
+
+FIXTURES = {
+    "nested": '<html><head><title>t</title></head><body><div class="a b" id="x"><p>one</p><p>two '
+              '<b>bold</b></p></div><ul><li>1</li><li class="c">2</li></ul></body></html>',
+    "void tags": '<div><img alt="\\"quoted\\"" src="a.png"><br>after<hr/><input type="text"></div>',
+    "self-closing": '<div><span/>text<img alt="x"/></div>',
+    "stray end tags": '<div><p>open</span></p></div></section><p>tail</p>',
+    "unclosed": '<div><p>first<p>second<li>item</div>',
+    "mismatched nesting": '<b><i>both</b> italic?</i><em>x</em>',
+    "whitespace": '<div>\n   <span>  padded  </span>\n\t</div><p>  a  b  </p>',
+    "quotes": '<p>"quoted title"</p><p>"</p>',
+    "comments": '<div><!-- skipped --><p>x<!-- y -->z</p></div><!DOCTYPE html><?pi data?>',
+    "cdata": '<div><![CDATA[raw <text>]]></div>',
+    "named entities": '<div>&amp; &lt;tag&gt; &copy; &nbsp;x &eacute;t&eacute;</div>',
+    "unknown entities": '<div>&notanentity; &amp</div><p>&notin; &not &notit;</p>',
+    "char refs": '<p>&#65;&#x42;&#128;&#0;&#xD800;&#1114112;</p>',
+    "attributes": '<div class="" id=""><a href="/x" class="  spaced   out ">link</a><p id>bare</p></div>',
+    "case": '<DIV CLASS="Up"><P>Mixed</P></DIV>',
+    "empty": '',
+    "text only": 'just text',
+}
+
+
+def as_columns(rows):
+    return {column: list(rows[column]) for column in COLUMNS}
+
+
+@pytest.mark.parametrize("markup", FIXTURES.values(), ids=FIXTURES.keys())
+def test_matches_bs4(markup):
+    assert as_columns(extract_rows(markup)) == as_columns(extract_rows_bs4(markup))
+
+
+def test_generated_page_matches_bs4():
+    from benchmark import generate_nodes, render_html
+    markup = render_html(generate_nodes(2000, seed=3))
+    assert as_columns(extract_rows(markup)) == as_columns(extract_rows_bs4(markup))
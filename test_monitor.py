@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+from benchmark import PageServer, generate_nodes, mutate_nodes, render_html
+from extract import extract_rows
+from monitor import Monitor, Target
+from page_fetch import fetch_rows
+
+
+def static_render(url):
+    return fetch_rows(url, 0, save=False, mode="static")[0]
+
+
+def run_until(monitor, done, timeout=10):
+    async def main():
+        task = asyncio.create_task(monitor.run(duration=timeout))
+        while not task.done() and not done():
+            await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+
+
+def test_reports_a_change_on_a_stand_in_server(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    page = generate_nodes(200)
+    changes = []
+    with PageServer({"/": render_html(page)}) as server:
+        target = Target(server.url("/"), interval=0.1)
+        monitor = Monitor([target], static_render, on_change=lambda url, ops: changes.append((url, ops)),
+                          host_rate=0, jitter=0)
+
+        updated = []
+
+        def done():
+            if not updated and monitor.stats["same_body"]:                      #Rendered once, then checked unchanged
+                server.update({"/": render_html(mutate_nodes(page, 0.05))})
+                updated.append(True)
+            return bool(changes)
+
+        run_until(monitor, done)
+    assert changes and changes[0][0] == target.url
+    assert {op["op"] for op in changes[0][1]} <= {"insert", "delete", "update", "move"}
+    assert monitor.stats["renders"] < monitor.stats["checks"]                   #Unchanged checks skipped the render
+
+
+def test_renders_when_the_precheck_fails(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rows = extract_rows("<body><p>rendered</p></body>", root="body")
+    with PageServer({}) as server:
+        target = Target(server.url("/blocked"), interval=0.1)                   #404 to the pre-check's plain GET
+        monitor = Monitor([target], lambda url: rows, host_rate=0, jitter=0)
+        run_until(monitor, lambda: target.rows is not None)
+    assert target.rows is rows
+    assert monitor.stats["errors"] >= 1
+
+
+def test_renders_respect_the_host_limit():
+    lock = threading.Lock()
+    active = {"now": 0, "max": 0, "renders": 0}
+
+    def slow_render(url):
+        with lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        time.sleep(0.1)
+        with lock:
+            active["now"] -= 1
+            active["renders"] += 1
+        return extract_rows("<body><p>x</p></body>", root="body")
+
+    targets = [Target(f"http://example.test/{i}", interval=0.05, precheck=False) for i in range(4)]
+    monitor = Monitor(targets, slow_render, render_workers=4, host_concurrency=1, host_rate=0, jitter=0)
+    run_until(monitor, lambda: active["renders"] >= 6)
+    assert active["renders"] >= 6
+    assert active["max"] == 1
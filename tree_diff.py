@@ -0,0 +1,230 @@
+from collections import Counter, deque
+from difflib import SequenceMatcher
+import numpy as np
+from merkle import node_hashes
+
+FIELDS = ["Title", "Class", "ID"]
+
+
+def _structure(depths):
+    """Parent and subtree end of every row, given depths in document order."""
+    n = len(depths)
+    parent = np.full(n, -1, dtype=np.int64)
+    end = np.full(n, n, dtype=np.int64)
+    if n == 0:
+        return parent, end
+
+    if depths.min() == depths[0] and (np.diff(depths) <= 1).all():
+        # Depth never jumps by more than one level, so a node's parent is the closest
+        # earlier row one level up and its subtree ends at the next row at or above it.
+        positions = np.arange(n)
+        previous = None
+        for depth in range(int(depths[0]), int(depths.max()) + 1):
+            level = positions[depths == depth]
+            if previous is not None and len(previous):
+                before = np.searchsorted(previous, level) - 1
+                parent[level] = np.where(before >= 0, previous[np.maximum(before, 0)], -1)
+            bound = positions[depths <= depth]
+            after = np.searchsorted(bound, level, side="right")
+            end[level] = np.where(after < len(bound), bound[np.minimum(after, len(bound) - 1)], n)
+            previous = level
+        return parent, end
+
+    stack = []
+    for i, depth in enumerate(depths.tolist()):
+        while stack and depths[stack[-1]] >= depth:
+            end[stack.pop()] = i
+        parent[i] = stack[-1] if stack else -1
+        stack.append(i)
+    return parent, end
+
+
+def _column(rows, name):                                                        #NodeTable rows hand over whole columns at once
+    if hasattr(rows, "column"):
+        return rows.column(name)
+    return [row.get(name) for row in rows]
+
+
+class Tree:
+    """Rows in document order rebuilt into a tree using their Depth column.
+
+    Rows without a Depth (older CSV exports) are treated as siblings under one root.
+    Structure is kept in NumPy arrays; child lists and paths are only built for the
+    parts of the tree the diff actually visits.
+    """
+
+    def __init__(self, rows, use_stored_hashes=True):
+        self.rows = rows
+        n = len(rows)
+        if hasattr(rows, "table"):
+            depths = np.asarray(rows.table.columns["depth"], dtype=np.int64)
+        else:
+            depths = np.fromiter((int(row.get("Depth") or 0) for row in rows), dtype=np.int64, count=n)
+        self.parent, self.end = _structure(depths)
+        self._child_order = np.argsort(self.parent, kind="stable")
+        self._child_start = np.searchsorted(self.parent[self._child_order], np.arange(-1, n + 1))
+        self._positions = {}
+        self._paths = {-1: ""}
+
+        ids = _column(rows, "ID")
+        id_counts = Counter(id_ for id_ in ids if id_)
+        self.unique_ids = {id_: i for i, id_ in enumerate(ids) if id_ and id_counts[id_] == 1}
+
+        if use_stored_hashes:
+            self.hashes = _column(rows, "Hash")
+        else:
+            self.hashes = node_hashes(_column(rows, "Tag"), _column(rows, "Title"), _column(rows, "Class"),
+                                      [id_ or None for id_ in ids], depths.tolist())[0]
+
+    def children(self, i):
+        return self._child_order[self._child_start[i + 1]:self._child_start[i + 2]].tolist()
+
+    def position(self, i):                                                      #Index among earlier siblings with the same tag
+        if i not in self._positions:
+            counts = {}
+            for child in self.children(int(self.parent[i])):
+                tag = self.rows[child]["Tag"]
+                self._positions[child] = counts.get(tag, 0)
+                counts[tag] = self._positions[child] + 1
+        return self._positions[i]
+
+    def path(self, i):                                                          #Structural path such as /body[0]/div[2]/ul[0]
+        if i in self._paths:
+            return self._paths[i]
+        chain = []
+        while i not in self._paths:
+            chain.append(i)
+            i = int(self.parent[i])
+        for node in reversed(chain):
+            parent = int(self.parent[node])
+            self._paths[node] = f"{self._paths[parent]}/{self.rows[node]['Tag']}[{self.position(node)}]"
+        return self._paths[chain[0]]
+
+    def signature(self, i):
+        row = self.rows[i]
+        return (row["Tag"], row.get("Class"), row.get("ID"), row.get("Title"))
+
+
+def _align(old, new, children1, children2, match_pair):
+    # Siblings are aligned on their subtree hashes. Common prefix and suffix cover most of
+    # them on typical pages, so only the middle section goes through SequenceMatcher.
+    sig1 = [old.hashes[i] for i in children1]
+    sig2 = [new.hashes[j] for j in children2]
+    start = 0
+    while start < len(sig1) and start < len(sig2) and sig1[start] == sig2[start]:
+        match_pair(children1[start], children2[start])
+        start += 1
+    end1, end2 = len(sig1), len(sig2)
+    while end1 > start and end2 > start and sig1[end1 - 1] == sig2[end2 - 1]:
+        end1 -= 1
+        end2 -= 1
+        match_pair(children1[end1], children2[end2])
+    if start == end1 or start == end2:
+        return
+
+    matcher = SequenceMatcher(None, sig1[start:end1], sig2[start:end2], autojunk=False)
+    unmatched = []
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            for offset in range(i2 - i1):
+                match_pair(children1[start + i1 + offset], children2[start + j1 + offset])
+        else:
+            unmatched.append((op, children1[start + i1:start + i2], children2[start + j1:start + j2]))
+
+    # A subtree deleted in one place and inserted unchanged in another only changed its
+    # position among the siblings, e.g. li4 moved to the front of the same <ul>.
+    by_hash = {}
+    for _, removed, _ in unmatched:
+        for i in removed:
+            by_hash.setdefault(old.hashes[i], deque()).append(i)
+    moved_old, moved_new = set(), set()
+    for _, _, added in unmatched:
+        for j in added:
+            candidates = by_hash.get(new.hashes[j])
+            if candidates:
+                i = candidates.popleft()
+                moved_old.add(i)
+                moved_new.add(j)
+                match_pair(i, j, moved=True)
+
+    for op, removed, added in unmatched:
+        if op == "replace":
+            # Same tag at the same relative position is treated as an update of that node.
+            pending = {}
+            for i in removed:
+                if i not in moved_old:
+                    pending.setdefault(old.rows[i]["Tag"], deque()).append(i)
+            for j in added:
+                candidates = pending.get(new.rows[j]["Tag"])
+                if candidates and j not in moved_new:
+                    match_pair(candidates.popleft(), j)
+
+
+def _has_hashes(rows):
+    return not rows or "Hash" in rows[0]
+
+
+def diff_trees(rows1, rows2):
+    use_stored_hashes = _has_hashes(rows1) and _has_hashes(rows2)
+    old = Tree(rows1, use_stored_hashes)
+    new = Tree(rows2, use_stored_hashes)
+    if [old.hashes[i] for i in old.children(-1)] == [new.hashes[j] for j in new.children(-1)]:
+        return []                                                               #Same root hash: nothing changed
+
+    match_old = {-1: -1}
+    match_new = {-1: -1}
+    covered_old = np.zeros(len(rows1), dtype=bool)                               #Descendants of identical matched subtrees
+    covered_new = np.zeros(len(rows2), dtype=bool)
+    reordered = set()                                                           #Matched to a sibling in another position
+    queue = deque([(-1, -1)])
+
+    def match_pair(i, j, moved=False):
+        if i in match_old or j in match_new:
+            return
+        match_old[i] = j
+        match_new[j] = i
+        if moved:
+            reordered.add(i)
+        queue.append((i, j))
+
+    # Nodes with an ID that is unique in both pages are matched up front, wherever they are.
+    for id_, i in old.unique_ids.items():
+        j = new.unique_ids.get(id_)
+        if j is not None and old.rows[i]["Tag"] == new.rows[j]["Tag"]:
+            match_pair(i, j)
+
+    while queue:
+        i, j = queue.popleft()
+        if i != -1 and old.hashes[i] == new.hashes[j]:
+            # Identical subtrees: skip them entirely instead of descending.
+            covered_old[i + 1:old.end[i]] = True
+            covered_new[j + 1:new.end[j]] = True
+            continue
+        children1 = [child for child in old.children(i) if child not in match_old]
+        children2 = [child for child in new.children(j) if child not in match_new]
+        if children1 and children2:
+            _align(old, new, children1, children2, match_pair)
+
+    ops = []
+    for i, j in match_old.items():
+        if i == -1 or covered_old[i]:
+            continue
+        row1, row2 = old.rows[i], new.rows[j]
+        changes = {}
+        if old.signature(i) != new.signature(j):
+            for field in FIELDS:
+                if row1.get(field) != row2.get(field):
+                    changes[field] = {"Old": row1.get(field, ""), "New": row2.get(field, "")}
+        if changes:
+            ops.append({"op": "update", "index": j, "path": new.path(j), "tag": row2["Tag"],
+                        "old": dict(row1), "new": dict(row2), "changes": changes})
+        if i in reordered or match_old.get(int(old.parent[i])) != int(new.parent[j]):
+            ops.append({"op": "move", "index": j, "tag": row2["Tag"], "from": old.path(i), "to": new.path(j)})
+
+    covered_old[[i for i in match_old if i != -1]] = True
+    covered_new[[j for j in match_new if j != -1]] = True
+    for i in np.flatnonzero(~covered_old).tolist():
+        ops.append({"op": "delete", "index": i, "path": old.path(i), "tag": rows1[i]["Tag"], "row": dict(rows1[i])})
+    for j in np.flatnonzero(~covered_new).tolist():
+        ops.append({"op": "insert", "index": j, "path": new.path(j), "tag": rows2[j]["Tag"], "row": dict(rows2[j])})
+    return ops
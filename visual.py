@@ -0,0 +1,212 @@
+import base64
+import hashlib
+import io
+import logging
+import os
+import sys
+import threading
+import numpy as np
+import metrics
+
+try:
+    from PIL import Image                                                       #Pillow, optional: only needed to decode screenshots
+except ImportError:
+    Image = None
+
+GRID = 8                                                                        #Each tile hash is an 8x8 grid of block means, 64 bits
+
+
+def capture_screenshot(driver, max_height=16384):
+    """Full-page PNG through the DevTools protocol, including what lies below the viewport."""
+    layout = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})
+    size = layout.get("cssContentSize") or layout["contentSize"]
+    clip = {"x": 0, "y": 0, "width": int(size["width"]), "height": int(min(size["height"], max_height)), "scale": 1}
+    shot = driver.execute_cdp_cmd("Page.captureScreenshot", {"format": "png", "captureBeyondViewport": True,
+                                                             "clip": clip})
+    return base64.b64decode(shot["data"])
+
+
+def decode_gray(png):
+    if Image is None:
+        raise ImportError("Visual change detection needs Pillow to decode screenshots (pip install Pillow)")
+    with Image.open(io.BytesIO(png)) as image:
+        return np.asarray(image.convert("L"))
+
+
+def tile_hashes(gray, tile=32):
+    """Average hash and mean brightness of every tile x tile block of a grayscale image.
+
+    The image is padded with white to whole tiles and viewed as (rows, 8, tile/8, cols, 8,
+    tile/8), so the 64 block means of every tile come out of one reduction. A tile's hash
+    has one bit per block, set when the block is brighter than the tile; the mean catches
+    the flat colour changes the hash alone cannot see. Returns (uint64 hashes, uint8 means),
+    both shaped (rows, cols).
+    """
+    if tile % GRID:
+        raise ValueError(f"Tile size must be a multiple of {GRID}, got {tile}")
+    height, width = gray.shape
+    rows, cols = -(-height // tile), -(-width // tile)
+    gray = np.pad(gray, ((0, rows * tile - height), (0, cols * tile - width)), constant_values=255)
+    step = tile // GRID
+    blocks = gray.reshape(rows, GRID, step, cols, GRID, step).sum(axis=(2, 5), dtype=np.uint32)
+    blocks = blocks.transpose(0, 2, 1, 3).reshape(rows, cols, GRID * GRID)
+    totals = blocks.sum(axis=2, dtype=np.uint64)
+    bits = blocks * np.uint64(GRID * GRID) > totals[:, :, None]                 #block mean > tile mean, in integers
+    hashes = np.packbits(bits, axis=2).view(">u8")[:, :, 0].astype(np.uint64)
+    means = (totals // np.uint64(tile * tile)).astype(np.uint8)
+    return hashes, means
+
+
+def _popcount(values):
+    return np.unpackbits(values.astype(">u8").view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def changed_tiles(old, new, max_distance=4, max_shift=8):
+    """Boolean (rows, cols) mask of tiles that differ between two tile_hashes results.
+
+    Only tiles whose hash or mean is not identical are looked at further; they count as
+    changed when more than max_distance hash bits flipped or the mean moved by more than
+    max_shift. Tiles that exist on only one side (the page grew or shrank) are changed, and
+    a different column count, i.e. a different page width, marks every tile.
+    """
+    (old_hashes, old_means), (new_hashes, new_means) = old, new
+    rows = max(old_hashes.shape[0], new_hashes.shape[0])
+    cols = new_hashes.shape[1]
+    mask = np.ones((rows, cols), dtype=bool)
+    if old_hashes.shape[1] != cols:
+        return mask
+    common = min(old_hashes.shape[0], new_hashes.shape[0])
+    old_hashes, new_hashes = old_hashes[:common], new_hashes[:common]
+    old_means, new_means = old_means[:common], new_means[:common]
+    differ = (old_hashes != new_hashes) | (old_means != new_means)
+    candidates = np.flatnonzero(differ)
+    distance = _popcount(old_hashes.ravel()[candidates] ^ new_hashes.ravel()[candidates])
+    shift = np.abs(old_means.ravel()[candidates].astype(np.int16) - new_means.ravel()[candidates])
+    changed = np.zeros(common * cols, dtype=bool)
+    changed[candidates] = (distance > max_distance) | (shift > max_shift)
+    mask[:common] = changed.reshape(common, cols)
+    return mask
+
+
+def regions(mask, tile=32, width=None, height=None):
+    """Bounding rectangles, in page pixels, of the 8-connected groups of changed tiles."""
+    rows, cols = mask.shape
+    seen = np.zeros_like(mask)
+    found = []
+    for start in zip(*np.nonzero(mask)):
+        if seen[start]:
+            continue
+        seen[start] = True
+        pending = [start]
+        count = 0
+        top, left, bottom, right = start[0], start[1], start[0], start[1]
+        while pending:
+            row, col = pending.pop()
+            count += 1
+            top, bottom, left, right = min(top, row), max(bottom, row), min(left, col), max(right, col)
+            for r in range(max(row - 1, 0), min(row + 2, rows)):
+                for c in range(max(col - 1, 0), min(col + 2, cols)):
+                    if mask[r, c] and not seen[r, c]:
+                        seen[r, c] = True
+                        pending.append((r, c))
+        x, y = int(left * tile), int(top * tile)
+        x_end, y_end = (right + 1) * tile, (bottom + 1) * tile
+        if width is not None:
+            x_end = min(x_end, width)
+        if height is not None:
+            y_end = min(y_end, height)
+        found.append({"x": x, "y": y, "width": int(x_end - x), "height": int(y_end - y), "tiles": count})
+    return found
+
+
+class TileHashStore:
+    """Last tile hashes per URL, one small .npz per page, so no old screenshot is ever kept."""
+
+    def __init__(self, directory="data/visual"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest() + ".npz")
+
+    def load(self, url):
+        try:
+            with np.load(self._path(url)) as saved:
+                return {name: saved[name] for name in saved.files}
+        except (OSError, ValueError):
+            return None
+
+    def save(self, url, hashes, means, tile, width, height):
+        path = self._path(url)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, hashes=hashes, means=means, tile=tile, width=width, height=height)
+        os.replace(tmp_path, path)                                              #Readers never see a half-written file
+
+
+class VisualChannel:
+    """Screenshot-based change detection for what the Tag/Title/Class/ID rows cannot see.
+
+    Each check takes a full-page screenshot, hashes it tile by tile, compares the hashes
+    with the ones stored for that URL by the previous check and stores the new ones. The
+    result is a list of changed-region rectangles, empty on the first check of a URL.
+    """
+
+    def __init__(self, directory="data/visual", tile=32, max_distance=4, max_shift=8, max_height=16384):
+        if Image is None:
+            raise ImportError("Visual change detection needs Pillow to decode screenshots (pip install Pillow)")
+        self.store = TileHashStore(directory)
+        self.tile = tile
+        self.max_distance = max_distance
+        self.max_shift = max_shift
+        self.max_height = max_height
+        self.regions = {}                                                       #url -> regions from its latest check
+        self._lock = threading.Lock()
+
+    def compare(self, url, gray):
+        hashes, means = tile_hashes(gray, self.tile)
+        height, width = gray.shape
+        previous = self.store.load(url)
+        found = []
+        if previous is not None and int(previous["tile"]) == self.tile:
+            mask = changed_tiles((previous["hashes"], previous["means"]), (hashes, means),
+                                 self.max_distance, self.max_shift)
+            found = regions(mask, self.tile, width, max(height, int(previous["height"])))
+        self.store.save(url, hashes, means, self.tile, width, height)
+        return found
+
+    def check(self, driver, url):
+        try:
+            with metrics.stage("screenshot") as span:
+                png = capture_screenshot(driver, self.max_height)
+                span.add(bytes=len(png))
+            with metrics.stage("tile_hash") as span:
+                found = self.compare(url, decode_gray(png))
+                span.add(regions=len(found))
+        except Exception as e:                                                  #The DOM rows are still good without it
+            logging.error(f"Error in visual check for URL {url}: {e}")
+            return None
+        with self._lock:
+            self.regions[url] = found
+        if found:
+            logging.info(f"Visual change on {url}: {len(found)} regions")
+        return found
+
+    def take(self, url):                                                        #Regions of the check just made for url, once
+        with self._lock:
+            return self.regions.pop(url, None)
+
+
+def visual_ops(regions):                                                        #Change events, alongside the diff_trees ops
+    return [{"op": "visual", "region": region} for region in regions or ()]
+
+
+if __name__ == "__main__":
+    # python visual.py <url> [url ...]: compares each page with its previous check
+    from page_fetch import load_elements, new_driver
+    channel = VisualChannel()
+    with new_driver() as driver:
+        for url in sys.argv[1:]:
+            driver.get(url)
+            load_elements(driver)
+            print(url, channel.check(driver, url))